@@ -0,0 +1,118 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Client settings for the front end, overridable through environment
+# variables (front_streamlit.py also reads API_BASE_URL from st.secrets).
+# Timeouts are in seconds: connecting, then waiting for the answer. Failed
+# connections and 502/503/504 answers are retried API_RETRIES times, waiting
+# API_BACKOFF * 2^n seconds in between (or the server's Retry-After)
+API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000')
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '5'))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', '60'))
+API_RETRIES = int(os.getenv('API_RETRIES', '3'))
+API_BACKOFF = float(os.getenv('API_BACKOFF', '0.5'))
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '8'))
+
+# Images sent per request to /sentiment/images/
+BATCH_SIZE = 64
+# Models the batch endpoint serves; the ensemble goes image by image
+BATCH_MODELS = ('model_a', 'model_b', 'model_c')
+RETRY_STATUSES = (502, 503, 504)
+
+
+def image_digest(image: bytes) -> str:
+    """Digest identifying an uploaded image in feedback; the API's result cache uses the same."""
+    return hashlib.blake2b(image, digest_size=16).hexdigest()
+
+
+class ApiClient:
+    """Client for the sentiment API over one pool of keep-alive connections.
+
+    Every call reuses the session's connections, so only the first request
+    pays for the TCP and TLS handshakes. A prediction is the same for the
+    same image, so prediction POSTs are retried like idempotent requests.
+    Feedback is not idempotent (a retry after the server stored it would
+    store it twice), so it goes through a second session that never retries.
+    Errors are raised as ``requests.exceptions.RequestException``.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, connect_timeout=API_CONNECT_TIMEOUT,
+                 read_timeout=API_READ_TIMEOUT, retries=API_RETRIES, backoff=API_BACKOFF,
+                 pool_size=API_POOL_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        retry = Retry(
+            total=retries,
+            # A read timeout already waited read_timeout; retrying it would
+            # keep the user waiting several times that
+            read=0,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # Retry POSTs too
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        once = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.feedback_session = requests.Session()
+        self.feedback_session.mount('http://', once)
+        self.feedback_session.mount('https://', once)
+
+    def _post(self, path, session=None, **kwargs):
+        session = session or self.session
+        response = session.post(self.base_url + path, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def predict(self, image: bytes, model: str, filename='image.jpg', **options) -> dict:
+        """Classifies one encoded image; ``options`` are extra form fields (top_k, ...)."""
+        return self._post('/sentiment/image/', data=dict(options, model=model),
+                          files={'file': (filename, image, 'image/jpeg')})
+
+    def predict_batch(self, images, model: str, **options) -> list:
+        """Classifies (filename, bytes) pairs in one /sentiment/images/ request."""
+        files = [('files', (filename, image, 'image/jpeg')) for filename, image in images]
+        return self._post('/sentiment/images/', data=dict(options, model=model), files=files)['results']
+
+    def predict_many(self, images, model: str, **options) -> list:
+        """Classifies a list of (filename, bytes) pairs, returning one result per image.
+
+        Single models go through the batch endpoint, BATCH_SIZE images per
+        request; the ensemble sends one request per image. Either way the
+        requests run concurrently over the connection pool.
+        """
+        images = list(images)
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            if model in BATCH_MODELS:
+                chunks = [images[i:i + BATCH_SIZE] for i in range(0, len(images), BATCH_SIZE)]
+                results = executor.map(lambda chunk: self.predict_batch(chunk, model, **options), chunks)
+                results = [result for chunk in results for result in chunk]
+                for index, result in enumerate(results):
+                    result['index'] = index  # Positions were counted per chunk
+                return results
+            return list(executor.map(
+                lambda item: self.predict(item[1], model, filename=item[0], **options), images))
+
+    def send_feedback(self, image: bytes, model: str, predicted: int, correct: bool,
+                      corrected=None, comments='', latency_ms=None) -> dict:
+        """Reports whether a prediction was right, without retrying. Only the image's digest is sent."""
+        data = {'image_hash': image_digest(image), 'model': model, 'predicted': predicted,
+                'correct': correct, 'comments': comments}
+        if corrected is not None:
+            data['corrected'] = corrected
+        if latency_ms is not None:
+            data['latency_ms'] = latency_ms
+        return self._post('/feedback/', session=self.feedback_session, data=data)
+
+    def close(self):
+        self.session.close()
+        self.feedback_session.close()
@@ -1,37 +1,59 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from keras.models import load_model
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from typing import List, Optional
+from functools import partial
 import numpy as np
-import cv2
-from PIL import Image
-import io
-import torch
-import torch.nn as nn
-import torchvision.transforms as transforms
-
-# Load Keras models
-model_a = load_model('modelo_affect_net.h5')
-model_b = load_model('modelo_affect_net_20_epocas.h5')
-
-# Load the PyTorch model
-class VITModel(nn.Module):
-    def __init__(self, num_classes=8):
-        super(VITModel, self).__init__()
-        # Define your model architecture here
-        # For example, if you used a pre-trained ViT model:
-        # self.model = torchvision.models.vit_b_16(pretrained=False)
-        # self.model.heads = nn.Linear(self.model.heads.in_features, num_classes)
-        self.model = torch.load('VIT-modelo.pth', map_location=torch.device('cpu'))
-    
-    def forward(self, x):
-        return self.model(x)
-
-model_c = VITModel()
-model_c.eval()  # Set the model to evaluation mode
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from archives import read_archive
+from batching import MicroBatcher
+from config import (
+    BATCH_CHUNK_SIZE, ENSEMBLE_TIMEOUT_MS, ENSEMBLE_TIMEOUTS_MS, ENSEMBLE_WEIGHTS, FACE_DETECTION,
+    FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_SECONDS, FEEDBACK_MAX_PENDING, FEEDBACK_PATH, INFERENCE_WORKERS,
+    MAX_BATCH_SIZE, MAX_BATCH_UPLOAD_BYTES, MAX_BATCH_WAIT_MS, MAX_IMAGES_PER_REQUEST, MAX_RESIDENT_MODELS,
+    MAX_UPLOAD_BYTES, MODEL_FALLBACKS, PRIORITY_AGING_MS,
+    RESULT_CACHE_PATH, RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RETRY_AFTER_SECONDS, SCHEDULER_EWMA_ALPHA,
+    STREAM_MAX_PENDING, STREAM_SMOOTHING_WINDOW, WARMUP_MODELS, WORKER_POOL_KIND, WORKER_POOL_SIZE, WORKER_QUEUE_SIZE,
+)
+from ensemble import fuse
+from face_detection import detect_faces
+from feedback_store import FeedbackStore
+from metrics import (
+    MetricsMiddleware, latest, record_batch, record_faces, record_prediction, record_schedule,
+    record_stream_frames, timed, track_cache, track_queue,
+)
+from models import build_registry
+from preprocessing import (
+    ImageTooLargeError, decode_and_preprocess, decode_for_models, decode_many, input_kind, normalize_batch,
+)
+from result_cache import build_result_cache, cache_key, cache_keys, content_digest
+from scheduler import HIGH, PRIORITIES, DeadlineError, Scheduler
+from serialization import (
+    NUM_CLASSES, binary_response, build_result, check_options, ndjson_line, render,
+)
+from streaming import FrameBuffer, Smoother
+from uploads import UploadLimitMiddleware, too_large
+from workers import QueueFullError, WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Models are loaded on first use (or at startup if listed in WARMUP_MODELS),
+# through Keras/PyTorch or ONNX Runtime depending on INFERENCE_BACKEND
+registry = build_registry(MAX_RESIDENT_MODELS)
 
 # Initialize the API
 app = FastAPI()
 
+# Oversized uploads are refused while they arrive, not after being buffered
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES, limits={
+    "/sentiment/images/": MAX_BATCH_UPLOAD_BYTES,
+})
+
 # Configure CORS
 origins = [
     "http://localhost",
@@ -48,68 +70,621 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def load_image(image: Image.Image, target_size=(96, 96)):
-    # Convert the image to a NumPy array
-    img = np.array(image)
-    img = cv2.resize(img, target_size)  # Resize
-    img = img / 255.0  # Normalize
-    return img
-
-def preprocess_for_vit(image: Image.Image):
-    # Define the preprocessing steps required for the ViT model
-    preprocess = transforms.Compose([
-        transforms.Resize((224, 224)),  # ViT models often use 224x224 images
-        transforms.ToTensor(),
-        transforms.Normalize(
-            mean=[0.485, 0.456, 0.406],  # Mean and std for ImageNet
-            std=[0.229, 0.224, 0.225]
-        ),
-    ])
-    return preprocess(image)
+# In-flight requests and end-to-end latency of the API endpoints
+app.add_middleware(MetricsMiddleware, paths=[
+    "/sentiment/image/", "/sentiment/image/all", "/sentiment/images/", "/sentiment/faces/",
+    "/feedback/",
+])
+
+def predict_resized(model: str, batch: np.ndarray) -> np.ndarray:
+    # Normalise the whole uint8 batch in one float32 step, then run the model
+    start = time.perf_counter()
+    outputs = registry.predict(model, normalize_batch(batch, input_kind(model)))
+    record_batch(model, len(batch), time.perf_counter() - start)
+    return outputs
+
+# Decoding and preprocessing run here, never on the event loop
+worker_pool = WorkerPool(WORKER_POOL_SIZE, WORKER_QUEUE_SIZE, WORKER_POOL_KIND)
+
+# Forward passes get their own threads; TensorFlow and PyTorch release the GIL
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+
+def make_batcher(predict_fn):
+    return MicroBatcher(predict_fn, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS,
+                        executor=inference_executor, max_queue=WORKER_QUEUE_SIZE,
+                        aging_ms=PRIORITY_AGING_MS)
+
+def predict_queued(model: str, batch: np.ndarray) -> np.ndarray:
+    # Batches from the request queues keep the scheduler's estimates current;
+    # one that had to load the model first says nothing about the next ones
+    loaded = model in registry.resident()
+    start = time.perf_counter()
+    outputs = predict_resized(model, batch)
+    if loaded:
+        scheduler.observe_batch(model, time.perf_counter() - start)
+    return outputs
+
+# One batching queue per model, so concurrent requests share a forward pass
+batchers = {model_id: make_batcher(partial(predict_queued, model_id)) for model_id in registry.ids()}
+
+# Requests with a deadline go to the model expected to answer in time
+scheduler = Scheduler(batchers, MODEL_FALLBACKS, worker_pool, SCHEDULER_EWMA_ALPHA)
+
+# Repeated uploads (sample images, resent frames) skip decode and inference
+result_cache = build_result_cache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_PATH)
+
+# The sqlite cache waits on a file shared by the workers, so its calls run on
+# their own thread, never on the event loop (nor on the worker pool, whose
+# slots are for decoding and which may be a process pool). Puts are not
+# waited for
+cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-cache')
+
+async def cache_get(keys):
+    """Cached probabilities, or None, for each key."""
+    if not result_cache.blocking:
+        return result_cache.get_many(keys)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cache_executor, result_cache.get_many, keys)
+
+def cache_put(key, probs):
+    if result_cache.blocking:
+        cache_executor.submit(result_cache.put, key, probs)
+    else:
+        result_cache.put(key, probs)
+
+# Read by Prometheus at scrape time, nothing is computed per request
+track_queue('worker_pool', lambda: worker_pool.pending)
+for model_id, batcher in batchers.items():
+    track_queue(model_id, batcher.depth)
+track_cache(result_cache)
+
+# Feedback is buffered and written in batches by a background thread
+feedback_store = FeedbackStore(FEEDBACK_PATH, FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_SECONDS,
+                               FEEDBACK_MAX_PENDING) if FEEDBACK_PATH else None
+
+SERVER_BUSY = "Server busy, retry later"
+
+def server_busy():
+    return HTTPException(
+        status_code=503,
+        detail=SERVER_BUSY,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+async def upload_source(file: UploadFile):
+    # Thread workers decode straight from the spooled upload (memory up to
+    # 1 MB, a temporary file beyond); process workers need picklable bytes
+    if worker_pool.kind == 'process':
+        return await file.read()
+    return file.file
+
+@app.on_event("startup")
+async def warmup_models():
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(inference_executor, registry.warmup, WARMUP_MODELS)
+
+@app.on_event("shutdown")
+def shutdown_pools():
+    worker_pool.shutdown()
+    inference_executor.shutdown(wait=False)
+    cache_executor.shutdown()
+    if feedback_store is not None:
+        feedback_store.close()
+
+ENSEMBLE = 'ensemble'
+
+async def predict_ensemble(source, deadline_ms=None, priority=PRIORITIES['normal']):
+    """Runs every model on one decoded image and fuses their probabilities.
+
+    Models are queued concurrently; one that misses its ENSEMBLE_TIMEOUTS_MS
+    deadline (or the request's ``deadline_ms`` if sooner, unless the request
+    is high priority) is reported as timed out and left out of the fused
+    prediction. Returns the fused vector, the vectors of the models that
+    answered and the errors of the others.
+    """
+    digest = await worker_pool.run(content_digest, source)
+    models = registry.ids()
+    keys = {m: cache_key(source, m, digest, registry.version(m)) for m in models}
+    probabilities = dict(zip(models, await cache_get([keys[m] for m in models])))
+    missing = [m for m in models if probabilities[m] is None]
+
+    errors = {}
+    if missing:
+        # Decode once; the Keras models share the same 96x96 input
+        inputs = await worker_pool.run(decode_for_models, source, [input_kind(m) for m in missing])
+        timeouts = {m: ENSEMBLE_TIMEOUTS_MS.get(m, ENSEMBLE_TIMEOUT_MS) for m in missing}
+        if deadline_ms is not None and priority != HIGH:
+            # High priority requests are never cut short by their deadline
+            timeouts = {m: min(timeout, deadline_ms) for m, timeout in timeouts.items()}
+        outputs = await asyncio.gather(
+            *(asyncio.wait_for(batchers[m].submit(inputs[input_kind(m)], priority), timeouts[m] / 1000.0)
+              for m in missing),
+            return_exceptions=True,
+        )
+        for m, output in zip(missing, outputs):
+            if isinstance(output, asyncio.TimeoutError):
+                errors[m] = "Timed out"
+            elif isinstance(output, QueueFullError):
+                errors[m] = SERVER_BUSY
+            elif isinstance(output, BaseException):
+                errors[m] = str(output)
+            else:
+                probabilities[m] = output
+                cache_put(keys[m], output)
+
+    answered = {m: p for m, p in probabilities.items() if p is not None}
+    if not answered:
+        if all(error == SERVER_BUSY for error in errors.values()):
+            raise server_busy()
+        raise HTTPException(status_code=504, detail="No model answered in time")
+
+    return fuse(answered, ENSEMBLE_WEIGHTS), answered, errors
+
+def ensemble_response(fused, answered, errors, top_k, probs_encoding, response_format):
+    record_prediction(ENSEMBLE, int(np.argmax(fused)))
+    for m, p in answered.items():
+        record_prediction(m, int(np.argmax(p)))
+    if response_format == 'binary':
+        # Fused row first, then one row per model in X-Models order
+        models = registry.ids()
+        return binary_response([fused] + [answered.get(m) for m in models],
+                               headers={"X-Models": ",".join(["ensemble"] + models)})
+    binary = response_format == 'msgpack'
+    payload = build_result(fused, top_k, True, probs_encoding, binary)
+    payload["models"] = {m: build_result(p, top_k, True, probs_encoding, binary)
+                         for m, p in answered.items()}
+    payload["models"].update({m: {"error": error} for m, error in errors.items()})
+    return render(payload, response_format)
+
+def check_response_options(response_format, probs_encoding, top_k):
+    error = check_options(response_format, probs_encoding, top_k)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+def check_schedule_options(deadline_ms, priority):
+    if deadline_ms is not None and deadline_ms <= 0:
+        raise HTTPException(status_code=400, detail="deadline_ms must be positive")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400,
+                            detail=f"priority must be one of: {', '.join(PRIORITIES)}")
+    return PRIORITIES[priority]
+
+def deadline_missed(detail):
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
 # Endpoint for image analysis
 @app.post("/sentiment/image/")
 async def predict_sentiment_from_image(
     file: UploadFile = File(...),
-    model: str = Form(...)
+    model: str = Form(...),
+    top_k: int = Form(0),
+    return_probs: bool = Form(False),
+    probs_encoding: str = Form('list'),
+    response_format: str = Form('json', alias='format'),
+    deadline_ms: Optional[float] = Form(None),
+    priority: str = Form('normal')
 ):
+    return await classify_upload(file, model, top_k, return_probs, probs_encoding, response_format,
+                                 deadline_ms, priority)
+
+async def classify_upload(file, model, top_k=0, return_probs=False, probs_encoding='list',
+                          response_format='json', deadline_ms=None, priority='normal'):
+    # With deadline_ms, the answer is wanted within that many milliseconds
+    # of the request reaching the endpoint: a model that cannot make it is
+    # replaced by a cheaper one (MODEL_FALLBACKS) and the response names the
+    # model used ("model_used", or the X-Model-Used header); if none can,
+    # the request gets a 503. High priority requests are never refused and
+    # are queued ahead of the others (by up to PRIORITY_AGING_MS per level)
+    start = time.perf_counter()
     try:
+        if model not in batchers and model != ENSEMBLE:
+            raise HTTPException(status_code=400, detail="Invalid model selected")
+        check_response_options(response_format, probs_encoding, top_k)
+        rank = check_schedule_options(deadline_ms, priority)
+
         # Read the image from the file
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
+        with timed('read', model):
+            source = await upload_source(file)
 
-        # Select the model
-        if model == 'model_a':
-            # Process the image
-            img = load_image(image)
-            img_array = np.expand_dims(img, axis=0)  # Add batch dimension
+        if model == ENSEMBLE:
+            fused, answered, errors = await predict_ensemble(source, deadline_ms, rank)
+            with timed('serialize', model):
+                return ensemble_response(fused, answered, errors, top_k, probs_encoding, response_format)
 
-            predictions = model_a.predict(img_array)
-            expresion = np.argmax(predictions, axis=1)[0]
+        # The upload is hashed in chunks on the worker pool, never on the loop
+        digest = await worker_pool.run(content_digest, source)
+        used = model
+        predictions, = await cache_get([cache_key(source, model, digest, registry.version(model))])
+        if predictions is None:
+            if deadline_ms is not None:
+                remaining_ms = deadline_ms - (time.perf_counter() - start) * 1000.0
+                try:
+                    used = scheduler.route(model, remaining_ms, rank)
+                except DeadlineError as e:
+                    record_schedule(model, 'shed')
+                    raise deadline_missed(str(e))
+                key = cache_key(source, used, digest, registry.version(used))
+                if used != model:
+                    predictions, = await cache_get([key])
+            else:
+                key = cache_key(source, model, digest, registry.version(model))
 
-        elif model == 'model_b':
-            # Process the image
-            img = load_image(image)
-            img_array = np.expand_dims(img, axis=0)  # Add batch dimension
+        if predictions is None:
+            # Decode and process the image on the worker pool
+            img, seconds = await worker_pool.run_timed(decode_and_preprocess, source, used)
+            scheduler.observe_preprocess(used, seconds)
 
-            predictions = model_b.predict(img_array)
-            expresion = np.argmax(predictions, axis=1)[0]
+            # Queued with other concurrent requests for the same model
+            with timed('batching', used):
+                if deadline_ms is None or rank == HIGH:
+                    predictions = await batchers[used].submit(img, rank)
+                else:
+                    # Past the deadline the answer is useless; the batcher
+                    # skips requests given up on
+                    remaining_ms = deadline_ms - (time.perf_counter() - start) * 1000.0
+                    try:
+                        predictions = await asyncio.wait_for(
+                            batchers[used].submit(img, rank), max(0.0, remaining_ms) / 1000.0)
+                    except asyncio.TimeoutError:
+                        record_schedule(model, 'expired')
+                        raise deadline_missed("Deadline passed while queued")
+            cache_put(key, predictions)
+        if deadline_ms is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            record_schedule(model, 'late' if elapsed_ms > deadline_ms
+                            else 'requested' if used == model else 'fallback')
+        record_prediction(used, int(np.argmax(predictions)))
 
-        elif model == 'model_c':
-            # Process the image for ViT model
-            img_tensor = preprocess_for_vit(image)
-            img_tensor = img_tensor.unsqueeze(0)  # Add batch dimension
+        # Return the result
+        with timed('serialize', used):
+            if response_format == 'binary':
+                headers = {"X-Model-Used": used} if deadline_ms is not None else None
+                return binary_response([predictions], headers=headers)
+            result = build_result(predictions, top_k, return_probs, probs_encoding,
+                                  binary=response_format == 'msgpack')
+            if deadline_ms is not None:
+                result["model_used"] = used
+            return render(result, response_format)
 
-            with torch.no_grad():
-                outputs = model_c(img_tensor)
-                _, predicted = torch.max(outputs, 1)
-                expresion = predicted.item()
+    except HTTPException:
+        raise
+    except QueueFullError:
+        raise server_busy()
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        else:
+# Endpoint running every model on the same image
+@app.post("/sentiment/image/all")
+async def predict_sentiment_all_models(
+    file: UploadFile = File(...),
+    top_k: int = Form(0),
+    probs_encoding: str = Form('list'),
+    response_format: str = Form('json', alias='format')
+):
+    return await classify_upload(file, ENSEMBLE, top_k, True, probs_encoding, response_format)
+
+# Endpoint finding every face in an image and classifying each of them
+@app.post("/sentiment/faces/")
+async def predict_sentiment_from_faces(
+    file: UploadFile = File(...),
+    model: str = Form(...),
+    detect: bool = Form(True),
+    top_k: int = Form(0),
+    return_probs: bool = Form(False),
+    probs_encoding: str = Form('list'),
+    response_format: str = Form('json', alias='format')
+):
+    try:
+        if model not in registry:
             raise HTTPException(status_code=400, detail="Invalid model selected")
+        check_response_options(response_format, probs_encoding, top_k)
 
-        # Return the result
-        return {"expresion": int(expresion)}
+        with timed('read', model):
+            source = await upload_source(file)
+
+        # Detection, cropping and resizing run on the worker pool
+        size, boxes, crops = await worker_pool.run(
+            detect_faces, source, model, input_kind(model), detect and FACE_DETECTION)
+        record_faces(len(boxes))
 
+        # Every face of the image goes to the model in one batch
+        predictions = []
+        if crops is not None:
+            loop = asyncio.get_running_loop()
+            predictions = await loop.run_in_executor(inference_executor, predict_resized, model, crops)
+        for probs in predictions:
+            record_prediction(model, int(np.argmax(probs)))
+
+        with timed('serialize', model):
+            if response_format == 'binary':
+                return binary_response(list(predictions), headers={
+                    "X-Boxes": ";".join(",".join(map(str, box)) for box in boxes)})
+            binary = response_format == 'msgpack'
+            faces = [dict(box=box, **build_result(probs, top_k, return_probs, probs_encoding, binary))
+                     for box, probs in zip(boxes, predictions)]
+            return render({"image_size": list(size), "faces": faces}, response_format)
+
+    except HTTPException:
+        raise
+    except QueueFullError:
+        raise server_busy()
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def preprocess_chunk(chunk, model):
+    # Look up the cache, then decode the misses in parallel; failures stay per
+    # image. The misses go to the pool as one job per worker, not one per
+    # image, so a chunk takes a few admission slots instead of all of them
+    keys = await worker_pool.run(cache_keys, [source for _, source in chunk], model,
+                                  registry.version(model))
+    cached = await cache_get(keys)
+    misses = [source for (_, source), hit in zip(chunk, cached) if hit is None]
+    step = max(1, -(-len(misses) // worker_pool.max_workers))
+    slices = [misses[i:i + step] for i in range(0, len(misses), step)]
+    jobs = await asyncio.gather(
+        *(worker_pool.run(decode_many, part, model) for part in slices),
+        return_exceptions=True,
+    )
+    decoded = iter([item for part, job in zip(slices, jobs)
+                    for item in (job if isinstance(job, list) else [job] * len(part))])
+    inputs = [next(decoded) if hit is None else None for hit in cached]
+    return keys, cached, inputs
+
+async def classify_images(images, model):
+    """Yields (probabilities, error) per (filename, bytes or file) pair, in input order.
+
+    Images are handled in chunks of BATCH_CHUNK_SIZE, each sent to the model as
+    a single batch, while the next chunk is already being decoded.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = [images[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(images), BATCH_CHUNK_SIZE)]
+    pending = asyncio.ensure_future(preprocess_chunk(chunks[0], model)) if chunks else None
+    try:
+        for position, chunk in enumerate(chunks):
+            keys, cached, inputs = await pending
+            pending = None
+            if position + 1 < len(chunks):
+                pending = asyncio.ensure_future(preprocess_chunk(chunks[position + 1], model))
+
+            predictions = {i: hit for i, hit in enumerate(cached) if hit is not None}
+            decoded = [i for i, item in enumerate(inputs)
+                       if item is not None and not isinstance(item, BaseException)]
+            if decoded:
+                batch = np.stack([inputs[i] for i in decoded])
+                outputs = await loop.run_in_executor(inference_executor, predict_resized, model, batch)
+                for i, output in zip(decoded, outputs):
+                    predictions[i] = output
+                    cache_put(keys[i], output)
+
+            for i in range(len(chunk)):
+                if i in predictions:
+                    record_prediction(model, int(np.argmax(predictions[i])))
+                    yield predictions[i], None
+                elif isinstance(inputs[i], QueueFullError):
+                    yield None, SERVER_BUSY
+                else:
+                    yield None, f"Could not read image: {inputs[i]}"
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    if not result_cache.blocking:
+        return result_cache.stats()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cache_executor, result_cache.stats)
+
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    return scheduler.stats()
+
+MAX_COMMENT_LENGTH = 2000
+
+# Endpoint recording whether a prediction was right, for retraining. The
+# image itself is never sent: it is identified by the BLAKE2 digest of the
+# uploaded bytes (16 bytes, hex), the same one the result cache uses
+@app.post("/feedback/", status_code=202)
+async def submit_feedback(
+    image_hash: str = Form(...),
+    model: str = Form(...),
+    predicted: int = Form(...),
+    correct: bool = Form(...),
+    corrected: Optional[int] = Form(None),
+    comments: str = Form(''),
+    latency_ms: Optional[float] = Form(None)
+):
+    if feedback_store is None:
+        raise HTTPException(status_code=404, detail="Feedback is disabled")
+    if model not in registry and model != ENSEMBLE:
+        raise HTTPException(status_code=400, detail="Invalid model selected")
+    if len(image_hash) != 32 or set(image_hash) - set('0123456789abcdef'):
+        raise HTTPException(status_code=400, detail="image_hash must be a 32 digit hex BLAKE2 digest")
+    for value in (predicted, corrected):
+        if value is not None and not 0 <= value < NUM_CLASSES:
+            raise HTTPException(status_code=400, detail=f"Classes go from 0 to {NUM_CLASSES - 1}")
+
+    # Only queued here; the write happens later, off the request path
+    if not feedback_store.add(image_hash=image_hash, model=model, predicted=predicted,
+                              corrected=corrected, correct=correct,
+                              comments=comments[:MAX_COMMENT_LENGTH], latency_ms=latency_ms):
+        raise server_busy()
+    return {"status": "queued"}
+
+@app.get("/feedback/stats")
+async def get_feedback_stats():
+    if feedback_store is None:
+        raise HTTPException(status_code=404, detail="Feedback is disabled")
+    return feedback_store.stats()
+
+# Endpoint for analysing many images in one request
+@app.post("/sentiment/images/")
+async def predict_sentiment_from_images(
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    model: str = Form(...),
+    stream: bool = Form(False),
+    top_k: int = Form(0),
+    return_probs: bool = Form(False),
+    probs_encoding: str = Form('list'),
+    response_format: str = Form('json', alias='format')
+):
+    try:
+        if model not in registry:
+            raise HTTPException(status_code=400, detail="Invalid model selected")
+        check_response_options(response_format, probs_encoding, top_k)
+        if stream and response_format != 'json':
+            raise HTTPException(status_code=400, detail="stream=true only supports format=json")
+
+        # Collect (filename, source) pairs from the files and the zip/tar archive;
+        # archive members are extracted within the same byte budget as uploads
+        images = []
+        with timed('read', model):
+            for file in files or []:
+                images.append((file.filename, await upload_source(file)))
+            if archive is not None:
+                source = await upload_source(archive)
+        if archive is not None:
+            try:
+                images.extend(await worker_pool.run(
+                    read_archive, source, MAX_IMAGES_PER_REQUEST, MAX_UPLOAD_BYTES, MAX_BATCH_UPLOAD_BYTES))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        if not images:
+            raise HTTPException(status_code=400, detail="No images provided")
+        if len(images) > MAX_IMAGES_PER_REQUEST:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_IMAGES_PER_REQUEST} images per request",
+            )
+
+        binary = response_format == 'msgpack'
+
+        def image_result(index, probs, error):
+            result = {"index": index, "filename": images[index][0]}
+            if error:
+                result["error"] = error
+            else:
+                result.update(build_result(probs, top_k, return_probs, probs_encoding, binary))
+            return result
+
+        # NDJSON: one line per image, sent as soon as its chunk is done
+        if stream:
+            async def ndjson():
+                index = 0
+                async for probs, error in classify_images(images, model):
+                    yield ndjson_line(image_result(index, probs, error))
+                    index += 1
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        outcomes = [outcome async for outcome in classify_images(images, model)]
+        if any(error == SERVER_BUSY for _, error in outcomes):
+            raise server_busy()
+        with timed('serialize', model):
+            if response_format == 'binary':
+                return binary_response([probs for probs, _ in outcomes])
+            return render(
+                {"results": [image_result(i, probs, error) for i, (probs, error) in enumerate(outcomes)]},
+                response_format,
+            )
+
+    except HTTPException:
+        raise
+    except QueueFullError:
+        raise server_busy()
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def predict_frames(frames, model):
+    # Decode the waiting frames in parallel and queue them on the model's batcher
+    async def predict(data):
+        img = await worker_pool.run(decode_and_preprocess, data, model)
+        return await batchers[model].submit(img)
+
+    return await asyncio.gather(*(predict(data) for _, data, _ in frames), return_exceptions=True)
+
+# Endpoint for live video: send encoded frames as binary messages, receive
+# one JSON prediction per processed frame
+@app.websocket("/sentiment/stream")
+async def stream_sentiment(
+    websocket: WebSocket,
+    model: str = 'model_a',
+    smoothing: int = STREAM_SMOOTHING_WINDOW,
+    return_probs: bool = False
+):
+    if model not in batchers:
+        await websocket.close(code=1008, reason="Invalid model selected")
+        return
+    await websocket.accept()
+
+    frames = FrameBuffer(STREAM_MAX_PENDING)
+    smoother = Smoother(smoothing)
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes")
+                if data and len(data) > MAX_UPLOAD_BYTES:
+                    await websocket.close(code=1009, reason=too_large(MAX_UPLOAD_BYTES).detail)
+                    break
+                if data:
+                    frames.push(data)
+        finally:
+            frames.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    dropped = 0
+    try:
+        while True:
+            batch = await frames.take(MAX_BATCH_SIZE)
+            if not batch:
+                break
+            outputs = await predict_frames(batch, model)
+
+            record_stream_frames(model, 'dropped', frames.dropped - dropped)
+            dropped = frames.dropped
+            for (index, _, received), output in zip(batch, outputs):
+                result = {"frame": index}
+                if isinstance(output, QueueFullError):
+                    result["error"] = SERVER_BUSY
+                    record_stream_frames(model, 'failed')
+                elif isinstance(output, BaseException):
+                    result["error"] = f"Could not read frame: {output}"
+                    record_stream_frames(model, 'failed')
+                else:
+                    record_prediction(model, int(np.argmax(output)))
+                    record_stream_frames(model, 'processed')
+                    result.update(build_result(output, return_probs=return_probs))
+                    result["smoothed"] = int(np.argmax(smoother.update(output)))
+                result["dropped"] = frames.dropped
+                result["latency_ms"] = round((time.perf_counter() - received) * 1000.0, 2)
+                try:
+                    await websocket.send_json(result)
+                except (WebSocketDisconnect, RuntimeError):
+                    # The client went away while we were sending; nothing left to do
+                    return
+    except Exception:
+        logger.exception("Stream of %s frames failed", model)
+        try:
+            await websocket.close(code=1011, reason="Internal error")
+        except RuntimeError:
+            pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,60 @@
+import io
+import os
+import tarfile
+import zipfile
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+
+def is_image_name(name):
+    return os.path.basename(name).lower().endswith(IMAGE_EXTENSIONS) \
+        and not os.path.basename(name).startswith('.')
+
+
+def _check_member_size(name, size, max_member_bytes):
+    # Checked on the size recorded in the archive, before extracting anything
+    if max_member_bytes is not None and size > max_member_bytes:
+        raise ValueError(f"{name} is larger than {max_member_bytes} bytes")
+
+
+def iter_archive_images(fileobj, max_member_bytes=None):
+    """Yields (name, bytes) for every image in a zip or tar archive, in archive order."""
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_image_name(info.filename):
+                    _check_member_size(info.filename, info.file_size, max_member_bytes)
+                    yield info.filename, archive.read(info)
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r:*')
+    except tarfile.TarError:
+        raise ValueError("Archive must be a zip or tar file")
+    with archive:
+        for member in archive:
+            if member.isfile() and is_image_name(member.name):
+                _check_member_size(member.name, member.size, max_member_bytes)
+                yield member.name, archive.extractfile(member).read()
+
+
+def read_archive(source, limit=None, max_member_bytes=None, max_total_bytes=None):
+    """Returns the images of an archive (bytes or a binary file) as a list of (name, bytes).
+
+    Extraction stops with a ValueError past ``limit`` images, or when an image
+    or all of them together would exceed the given sizes once uncompressed.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    images = []
+    total = 0
+    for name, data in iter_archive_images(source, max_member_bytes):
+        if limit is not None and len(images) >= limit:
+            raise ValueError(f"Archive holds more than {limit} images")
+        total += len(data)
+        if max_total_bytes is not None and total > max_total_bytes:
+            raise ValueError(f"Archive images add up to more than {max_total_bytes} bytes")
+        images.append((name, data))
+    return images
@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import time
+
+import numpy as np
+
+from workers import QueueFullError
+
+
+class MicroBatcher:
+    """Groups concurrent single-image requests into one batched model call.
+
+    ``predict_fn`` receives a stacked array of shape (N, ...) and must return
+    one output per row. The first queued request waits at most ``max_wait_ms``
+    for others to join, or until ``max_batch_size`` requests are collected.
+    When ``max_queue`` requests are already waiting, ``submit`` raises
+    ``QueueFullError`` instead of queueing more; requests given up on while
+    queued (cancelled, e.g. past their deadline) no longer count.
+
+    Requests with a lower ``priority`` number are batched first, but each
+    level is only worth ``aging_ms`` of waiting: a request is served ahead
+    of those queued more than ``aging_ms`` after it with a priority one
+    higher, so a steady stream of high priority requests delays low priority
+    ones without starving them. Equal priorities keep their order.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, executor=None,
+                 max_queue=None, aging_ms=1000.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self.max_queue = max_queue
+        self.aging = max(0.0, aging_ms) / 1000.0
+        self.running = 0
+        self._queue = None
+        self._worker = None
+        self._queued = {}  # future -> rank, for the requests still waiting
+        self._order = itertools.count()
+
+    def _rank(self, priority):
+        return time.monotonic() + priority * self.aging
+
+    def depth(self, priority=None):
+        """Requests waiting for a batch; with ``priority``, those served before it."""
+        if priority is None:
+            return len(self._queued)
+        rank = self._rank(priority)
+        return sum(1 for queued in self._queued.values() if queued <= rank)
+
+    async def submit(self, item, priority=1):
+        """Queue one preprocessed input and wait for its own output."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            # Started lazily so the batcher binds to the running event loop
+            self._queue = asyncio.PriorityQueue()
+            self._queued.clear()
+            self._worker = loop.create_task(self._run())
+        if self.max_queue is not None and len(self._queued) >= self.max_queue:
+            raise QueueFullError("Batching queue is full")
+        future = loop.create_future()
+        rank = self._rank(priority)
+        # The counter breaks ties, so arrays are never compared
+        self._queue.put_nowait((rank, next(self._order), item, future))
+        self._queued[future] = rank
+        future.add_done_callback(self._forget)
+        return await future
+
+    def _forget(self, future):
+        self._queued.pop(future, None)
+
+    def _take(self, entry):
+        # None for a request given up on while it was queued
+        _, _, item, future = entry
+        self._forget(future)
+        return None if future.done() else (item, future)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        while not batch:
+            taken = self._take(await self._queue.get())
+            if taken is not None:
+                batch.append(taken)
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                taken = self._take(self._queue.get_nowait())
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    taken = self._take(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            if taken is not None:
+                batch.append(taken)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests whose client already went away are not worth computing
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.running = len(batch)
+            try:
+                inputs = np.stack([item for item, _ in batch])
+                outputs = await loop.run_in_executor(self.executor, self.predict_fn, inputs)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                for (_, future), output in zip(batch, outputs):
+                    if not future.done():
+                        future.set_result(output)
+            finally:
+                self.running = 0
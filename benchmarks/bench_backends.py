@@ -0,0 +1,85 @@
+"""Accuracy parity and speed of the inference backends.
+
+Runs the samples/ images through every model with the native backend
+(Keras/PyTorch) and with ONNX Runtime (FP32 and, when exported, INT8), then
+reports how often the predicted class agrees with native, the largest
+probability difference, single-image latency and batched throughput.
+Export the ONNX files first with export_onnx.py.
+
+    python benchmarks/bench_backends.py --batch-size 32
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import ONNX_DIR  # noqa: E402
+from models import MODEL_FRAMEWORKS, build_registry, onnx_path  # noqa: E402
+from preprocessing import decode_and_preprocess, input_kind, normalize_batch  # noqa: E402
+
+
+def load_samples(model_id, pattern):
+    images = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'rb') as f:
+            images.append(decode_and_preprocess(f.read(), model_id))
+    return normalize_batch(np.stack(images), input_kind(model_id))
+
+
+def timed(predict, batch, repeats):
+    predict(batch)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(batch)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', default=list(MODEL_FRAMEWORKS))
+    parser.add_argument('--samples', default=os.path.join(ROOT, 'samples', '*.png'))
+    parser.add_argument('--onnx-dir', default=ONNX_DIR)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    backends = {
+        'native': build_registry(1, 'native'),
+        'onnx fp32': build_registry(1, 'onnx', int8=False, onnx_dir=args.onnx_dir),
+        'onnx int8': build_registry(1, 'onnx', int8=True, onnx_dir=args.onnx_dir),
+    }
+
+    for model_id in args.models:
+        samples = load_samples(model_id, args.samples)
+        reps = -(-args.batch_size // len(samples))
+        batch = np.concatenate([samples] * reps)[:args.batch_size]
+        print(f"{model_id} ({len(samples)} sample images, batch of {len(batch)})")
+
+        reference = None
+        for name, registry in backends.items():
+            if name == 'onnx int8' and not onnx_path(model_id, True, args.onnx_dir).endswith('.int8.onnx'):
+                continue  # no INT8 export for this model
+            try:
+                predict = registry.get(model_id)
+            except (ImportError, OSError, ValueError) as e:
+                print(f"  {name:10s} skipped ({e.__class__.__name__}: {e})")
+                continue
+            probs = predict(samples)
+            if reference is None:
+                reference = probs  # parity is measured against the first backend that loads
+            agreement = np.mean(probs.argmax(axis=1) == reference.argmax(axis=1))
+            max_diff = np.abs(probs - reference).max()
+            latency = timed(predict, samples[:1], args.repeats) * 1000.0
+            throughput = len(batch) / timed(predict, batch, args.repeats)
+            print(f"  {name:10s} agree {agreement:6.1%}  max |dp| {max_diff:.4f}  "
+                  f"latency {latency:7.2f} ms  throughput {throughput:8.1f} img/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Throughput of the micro-batching queue against one call per request.
+
+Uses a stand-in model whose cost is a fixed per-call overhead plus a small
+per-image cost, which is how Keras/PyTorch behave on CPU for small inputs.
+
+    python benchmarks/bench_batching.py --requests 512 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher  # noqa: E402
+
+
+def make_model(call_overhead_ms, per_image_ms):
+    def predict(batch):
+        time.sleep((call_overhead_ms + per_image_ms * len(batch)) / 1000.0)
+        return np.full((len(batch), 8), 1.0 / 8, dtype=np.float32)
+    return predict
+
+
+async def run_unbatched(predict, images, concurrency):
+    # Current behaviour: every request runs its own batch of one
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(img):
+        async with semaphore:
+            return await loop.run_in_executor(None, predict, img[None])
+
+    await asyncio.gather(*(one(img) for img in images))
+
+
+async def run_batched(predict, images, concurrency, max_batch_size, max_wait_ms):
+    batcher = MicroBatcher(predict, max_batch_size, max_wait_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(img):
+        async with semaphore:
+            return await batcher.submit(img)
+
+    await asyncio.gather(*(one(img) for img in images))
+
+
+def timed(coro):
+    start = time.perf_counter()
+    asyncio.run(coro)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--call-overhead-ms', type=float, default=20.0)
+    parser.add_argument('--per-image-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    predict = make_model(args.call_overhead_ms, args.per_image_ms)
+    images = [np.zeros((96, 96, 3), dtype=np.float32) for _ in range(args.requests)]
+
+    # The unbatched path is limited to one model call at a time, like the
+    # synchronous endpoint it replaces
+    unbatched = timed(run_unbatched(predict, images, 1))
+    batched = timed(run_batched(predict, images, args.concurrency,
+                                args.max_batch_size, args.max_wait_ms))
+
+    print(f"requests={args.requests} concurrency={args.concurrency} "
+          f"max_batch_size={args.max_batch_size} max_wait_ms={args.max_wait_ms}")
+    print(f"one-at-a-time: {args.requests / unbatched:8.1f} img/s ({unbatched:.2f} s)")
+    print(f"micro-batched: {args.requests / batched:8.1f} img/s ({batched:.2f} s)")
+    print(f"speed-up:      {unbatched / batched:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
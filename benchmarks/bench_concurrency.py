@@ -0,0 +1,127 @@
+"""Latency of cheap requests while slow ones run, with and without the worker pool.
+
+Two FastAPI apps, each served by uvicorn in a background thread, run the same blocking work: one runs it inline
+on the event loop (the old endpoint), the other through ``WorkerPool``.
+Requests are mixed: a few slow "ViT" calls among many cheap "Keras" ones.
+
+    python benchmarks/bench_concurrency.py --requests 400 --slow-ratio 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workers import QueueFullError, WorkerPool  # noqa: E402
+
+
+def blocking_work(ms):
+    time.sleep(ms / 1000.0)
+    return 0
+
+
+def build_app(pool, slow_ms, cheap_ms):
+    app = FastAPI()
+
+    async def work(ms):
+        if pool is None:
+            return blocking_work(ms)
+        try:
+            return await pool.run(blocking_work, ms)
+        except QueueFullError:
+            raise HTTPException(status_code=503, headers={"Retry-After": "1"})
+
+    @app.post("/slow")
+    async def slow():
+        return {"expresion": await work(slow_ms)}
+
+    @app.post("/cheap")
+    async def cheap():
+        return {"expresion": await work(cheap_ms)}
+
+    return app
+
+
+def serve_in_thread(app):
+    # A real server keeps the client's event loop separate from the app's
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f'http://127.0.0.1:{port}'
+
+
+async def load_test(base_url, requests, concurrency, slow_ratio, seed):
+    rng = random.Random(seed)
+    paths = ['/slow' if rng.random() < slow_ratio else '/cheap' for _ in range(requests)]
+    latencies = {'/slow': [], '/cheap': []}
+    rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(path):
+            nonlocal rejected
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path)
+                if response.status_code == 503:
+                    rejected += 1
+                else:
+                    latencies[path].append((time.perf_counter() - start) * 1000.0)
+
+        await asyncio.gather(*(one(path) for path in paths))
+    return latencies, rejected
+
+
+def report(name, latencies, rejected):
+    for path, values in latencies.items():
+        if values:
+            p50, p99 = np.percentile(values, [50, 99])
+            print(f"{name:12s} {path:7s} n={len(values):4d} p50={p50:8.1f} ms p99={p99:8.1f} ms")
+    if rejected:
+        print(f"{name:12s} rejected with 503: {rejected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--slow-ratio', type=float, default=0.1)
+    parser.add_argument('--slow-ms', type=float, default=80.0)
+    parser.add_argument('--cheap-ms', type=float, default=5.0)
+    parser.add_argument('--pool-size', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    inline = build_app(None, args.slow_ms, args.cheap_ms)
+    pool = WorkerPool(args.pool_size, args.queue_size)
+    pooled = build_app(pool, args.slow_ms, args.cheap_ms)
+
+    for name, app in (('inline', inline), ('worker pool', pooled)):
+        server, thread, base_url = serve_in_thread(app)
+        latencies, rejected = asyncio.run(
+            load_test(base_url, args.requests, args.concurrency, args.slow_ratio, args.seed))
+        server.should_exit = True
+        thread.join()
+        report(name, latencies, rejected)
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Deadline-hit rate of model_c requests under overload, with and without the scheduler.
+
+Serves app.py with uvicorn in a child process (stand-in models for any model
+without weights, result cache off) and sends /sentiment/image/ requests for
+--model at --rate requests per second with Poisson arrivals, without waiting
+for the answers, so an overloaded server keeps falling behind as a real one
+would. The same load runs twice: once without deadline_ms (every request
+queues on --model) and once with it, so the scheduler may fall back to a
+cheaper model or refuse a request up front. A --high-share of the requests
+are sent as high priority.
+
+A request hits its deadline when it gets a 200 within --deadline-ms, as the
+client measures it. The report gives the hit rate per priority, which model
+answered, how many were refused (503) and the latency of the answers.
+
+    python benchmarks/bench_deadlines.py --rate 40 --deadline-ms 300
+    MODEL_FALLBACKS=model_c:model_b python benchmarks/bench_deadlines.py --duration 20
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+from bench_uploads import ROOT, start_server
+
+
+async def overload(base_url, image, args, scheduled):
+    rng = random.Random(0)
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def one(priority):
+            data = {'model': args.model}
+            if scheduled:
+                data.update(deadline_ms=str(args.deadline_ms), priority=priority)
+            start = time.perf_counter()
+            try:
+                response = await client.post('/sentiment/image/', data=data,
+                                             files={'file': ('face.png', image, 'image/png')})
+                status = response.status_code
+                used = response.json().get('model_used', args.model) if status == 200 else None
+            except httpx.TransportError as e:
+                status, used = type(e).__name__, None
+            results.append((priority, status, used, (time.perf_counter() - start) * 1000.0))
+
+        tasks = []
+        end = time.perf_counter() + args.duration
+        while time.perf_counter() < end:
+            priority = 'high' if rng.random() < args.high_share else 'normal'
+            tasks.append(asyncio.create_task(one(priority)))
+            await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def report(name, results, deadline_ms):
+    print(f"\n{name}: {len(results)} requests")
+    for priority in ('normal', 'high'):
+        rows = [r for r in results if r[0] == priority]
+        if not rows:
+            continue
+        hits = sum(1 for _, status, _, ms in rows if status == 200 and ms <= deadline_ms)
+        answered = [ms for _, status, _, ms in rows if status == 200]
+        statuses = Counter(status for _, status, _, _ in rows)
+        models = Counter(used for _, status, used, _ in rows if status == 200)
+        latency = (f"p50 {np.percentile(answered, 50):6.0f} ms, p99 {np.percentile(answered, 99):6.0f} ms"
+                   if answered else "no answers")
+        print(f"  {priority:6s}: deadline hit {hits / len(rows):6.1%} ({hits}/{len(rows)}), "
+              f"answered {latency}")
+        print(f"          statuses {dict(statuses)}, answered by {dict(models)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='model_c')
+    parser.add_argument('--standins', choices=['auto', 'always', 'never'], default='auto')
+    parser.add_argument('--rate', type=float, default=40.0, help='Requests per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per run')
+    parser.add_argument('--deadline-ms', type=float, default=300.0)
+    parser.add_argument('--high-share', type=float, default=0.1)
+    args = parser.parse_args()
+
+    image = open(sorted(glob.glob(os.path.join(ROOT, 'samples', '*.png')))[0], 'rb').read()
+    server, base_url = start_server(args.standins)
+    try:
+        # Two requests per model first: load them and seed the latency estimates
+        for model in 2 * list(httpx.get(base_url + '/scheduler/stats').json()):
+            httpx.post(base_url + '/sentiment/image/', data={'model': model},
+                       files={'file': ('face.png', image, 'image/png')}, timeout=120)
+        print(f"{args.model} at {args.rate:g} req/s for {args.duration:g} s, "
+              f"deadline {args.deadline_ms:g} ms, {args.high_share:.0%} high priority")
+        print(f"estimates when idle: {httpx.get(base_url + '/scheduler/stats').json()}")
+
+        for name, scheduled in (('without deadline_ms', False), ('with deadline_ms', True)):
+            results = asyncio.run(overload(base_url, image, args, scheduled))
+            report(name, results, args.deadline_ms)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Upload size and session-history memory of the Streamlit front end, before and after.
+
+Before: every analysis uploaded the cropped image as a full-size JPEG and
+kept the full-size PIL image in the session history forever. After: uploads
+are downscaled to the largest model input (front_images.encode_for_upload)
+and the history keeps the last HISTORY_SIZE thumbnails as JPEG bytes.
+
+For every image in samples/ plus a synthetic camera photo, this prints both
+payload sizes, the encoding time, and how far the model input the API
+builds from the small upload is from the one it builds from the full image
+(mean absolute difference of the uint8 pixels, worst of the 96 and 224 px
+inputs). It then simulates a long session and compares the memory held by
+the history.
+
+    python benchmarks/bench_front_payload.py --analyses 100
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from front_images import HISTORY_SIZE, encode_for_upload, make_thumbnail  # noqa: E402
+from preprocessing import decode_and_preprocess  # noqa: E402
+
+
+def camera_photo(width=4032, height=3024):
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 8, pixels.shape), 0, 255).astype(np.uint8)
+    return 'camera (synthetic)', Image.fromarray(pixels)
+
+
+def old_upload(image):
+    # What front_streamlit.py sent before: the full image, default JPEG quality
+    buf = io.BytesIO()
+    image.convert('RGB').save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def input_difference(full, small):
+    return max(
+        float(np.abs(decode_and_preprocess(full, model).astype(np.int16)
+                     - decode_and_preprocess(small, model).astype(np.int16)).mean())
+        for model in ('model_a', 'model_c')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--analyses', type=int, default=100,
+                        help='Analyses in the simulated session')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    images = [(os.path.basename(path), Image.open(path))
+              for path in sorted(glob.glob(os.path.join(root, 'samples', '*.png')))]
+    images.append(camera_photo())
+
+    print(f"{'image':20s} {'size':>10s} {'before KB':>10s} {'after KB':>9s} {'ratio':>6s} "
+          f"{'before ms':>9s} {'after ms':>8s} {'input diff':>10s}")
+    before_total = after_total = 0
+    for name, image in images:
+        image.load()
+        full, full_ms = timed(old_upload, image)
+        small, small_ms = timed(encode_for_upload, image)
+        before_total += len(full)
+        after_total += len(small)
+        print(f"{name:20s} {'%dx%d' % image.size:>10s} {len(full) / 1024:10.1f} {len(small) / 1024:9.1f} "
+              f"{len(full) / len(small):5.0f}x {full_ms:9.1f} {small_ms:8.1f} "
+              f"{input_difference(full, small):10.2f}")
+    print(f"{'total':20s} {'':10s} {before_total / 1024:10.1f} {after_total / 1024:9.1f} "
+          f"{before_total / after_total:5.0f}x")
+
+    # Session of --analyses analyses cycling over the images
+    session = [images[i % len(images)][1] for i in range(args.analyses)]
+    before = sum(image.width * image.height * len(image.getbands()) for image in session)
+    thumbnails = [make_thumbnail(image) for image in session[-HISTORY_SIZE:]]
+    after = sum(len(thumbnail) for thumbnail in thumbnails)
+    print(f"\nhistory after {args.analyses} analyses: before {before / 2 ** 20:.1f} MB of pixel buffers "
+          f"({args.analyses} full-size images), after {after / 1024:.1f} KB "
+          f"({len(thumbnails)} JPEG thumbnails, bounded by HISTORY_SIZE={HISTORY_SIZE})")
+
+
+if __name__ == '__main__':
+    main()
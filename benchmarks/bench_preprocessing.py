@@ -0,0 +1,108 @@
+"""Per-image preprocessing time and memory, old functions against preprocessing.py.
+
+The "old" path is what app.py used to do per request: full-size decode,
+np.array + cv2.resize + float64 /255 for the Keras models, and a freshly
+built torchvision Compose for the ViT. Allocated bytes are the tracemalloc
+peak for one image (numpy reports its buffers to tracemalloc).
+
+    python benchmarks/bench_preprocessing.py --width 1280 --height 960
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing import decode_and_preprocess, input_kind, normalize_batch  # noqa: E402
+
+
+def old_keras(contents):
+    image = Image.open(io.BytesIO(contents)).convert('RGB')
+    img = np.array(image)
+    img = cv2.resize(img, (96, 96))
+    return np.expand_dims(img / 255.0, axis=0)
+
+
+def old_vit(contents):
+    import torchvision.transforms as transforms
+
+    image = Image.open(io.BytesIO(contents)).convert('RGB')
+    preprocess = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+    ])
+    return preprocess(image).unsqueeze(0)
+
+
+def new(model):
+    def run(contents):
+        resized = decode_and_preprocess(contents, model)
+        return normalize_batch(resized[None], input_kind(model))
+    return run
+
+
+def synthetic_jpeg(width, height, quality=90):
+    # Smooth gradients plus noise, closer to a camera frame than flat colour
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    image = np.clip(image + rng.normal(0, 12, image.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format='JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def measure(fn, contents, repeats):
+    fn(contents)  # warm up imports and caches
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(contents)
+    per_image_ms = (time.perf_counter() - start) * 1000.0 / repeats
+
+    tracemalloc.start()
+    fn(contents)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_image_ms, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--image', help='Benchmark this file instead of a synthetic JPEG')
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            contents = f.read()
+    else:
+        contents = synthetic_jpeg(args.width, args.height)
+    print(f"input: {len(contents) / 1024:.0f} KB, {Image.open(io.BytesIO(contents)).size}")
+
+    cases = [
+        ('keras old', old_keras),
+        ('keras new', new('model_a')),
+        ('vit old', old_vit),
+        ('vit new', new('model_c')),
+    ]
+    for name, fn in cases:
+        try:
+            per_image_ms, peak = measure(fn, contents, args.repeats)
+        except ImportError as e:
+            print(f"{name:10s} skipped ({e})")
+            continue
+        print(f"{name:10s} {per_image_ms:7.2f} ms/image  peak {peak / 1024 / 1024:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
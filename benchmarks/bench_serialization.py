@@ -0,0 +1,55 @@
+"""Cost of serialising batch results in each response format.
+
+Builds the /sentiment/images/ payload for N random probability vectors and
+times rendering it as JSON lists, JSON with base64 vectors, msgpack (if
+installed) and the raw float32 binary format.
+
+    python benchmarks/bench_serialization.py --images 1024
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import binary_response, build_result, msgpack, render  # noqa: E402
+
+
+def payload(rows, encoding, binary=False):
+    return {"results": [dict(index=i, filename=f"{i}.jpg",
+                             **build_result(p, 3, True, encoding, binary))
+                        for i, p in enumerate(rows)]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=1024)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=(args.images, 8)).astype(np.float32)
+    rows = list(np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True))
+
+    cases = {
+        'json list': lambda: render(payload(rows, 'list')),
+        'json base64': lambda: render(payload(rows, 'base64')),
+        'binary': lambda: binary_response(rows),
+    }
+    if msgpack is not None:
+        cases['msgpack'] = lambda: render(payload(rows, 'list', binary=True), 'msgpack')
+
+    for name, fn in cases.items():
+        body = fn().body
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            fn()
+        ms = (time.perf_counter() - start) * 1000.0 / args.repeats
+        print(f"{name:12s} {ms:8.2f} ms per response  {len(body) / 1024:8.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Time to first request and resident memory of a fresh API worker.
+
+Each scenario runs in its own Python process: import app.py, serve one
+request per listed model in-process, then report wall-clock times and the
+process RSS. Setting WARMUP_MODELS to every model reproduces the old
+behaviour of loading all three models at import time.
+
+    python benchmarks/bench_startup.py --model model_a
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import app
+imported = time.perf_counter()
+image = open(sys.argv[2], 'rb').read()
+with TestClient(app.app) as client:
+    started = time.perf_counter()
+    response = client.post('/sentiment/image/', files={'file': ('s.png', image, 'image/png')},
+                           data={'model': sys.argv[1]})
+    response.raise_for_status()
+first = time.perf_counter()
+rss_kb = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'import_s': imported - start,
+    'startup_s': started - start,
+    'first_request_s': first - start,
+    'rss_mb': rss_kb / 1024,
+    'resident_models': app.registry.resident(),
+    'frameworks': sorted(m for m in ('keras', 'tensorflow', 'torch') if m in sys.modules),
+}))
+'''
+
+
+def run(model, image, warmup):
+    env = dict(os.environ, WARMUP_MODELS=warmup)
+    process = subprocess.run([sys.executable, '-c', CHILD, model, image], cwd=ROOT, env=env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(process.stderr)
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='model_a')
+    parser.add_argument('--image', default=os.path.join(ROOT, 'samples', 'felicidad.png'))
+    args = parser.parse_args()
+
+    scenarios = {
+        'eager (all models at startup)': 'model_a,model_b,model_c',
+        'lazy (load on first use)': '',
+    }
+    for name, warmup in scenarios.items():
+        result = run(args.model, args.image, warmup)
+        print(f"{name}:")
+        print(f"  import app.py:      {result['import_s']:7.2f} s")
+        print(f"  ready to serve:     {result['startup_s']:7.2f} s")
+        print(f"  first response:     {result['first_request_s']:7.2f} s")
+        print(f"  resident memory:    {result['rss_mb']:7.1f} MB")
+        print(f"  models in memory:   {', '.join(result['resident_models'])}")
+        print(f"  frameworks loaded:  {', '.join(result['frameworks']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
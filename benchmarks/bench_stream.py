@@ -0,0 +1,91 @@
+"""Sustained frame rate and end-to-end lag of the WebSocket stream endpoint.
+
+Sends a synthetic video (a moving face-sized blob over a gradient, JPEG
+encoded) at a fixed frame rate to a running API and reports how many frames
+per second come back, how many the server dropped, and the lag between
+sending a frame and receiving its prediction.
+
+    uvicorn app:app --port 8000 &
+    python benchmarks/bench_stream.py --url ws://localhost:8000/sentiment/stream --fps 30
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+
+import numpy as np
+import websockets
+from PIL import Image
+
+
+def synthetic_frames(count, width, height, quality=80):
+    y, x = np.mgrid[0:height, 0:width]
+    background = np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 96)], axis=-1)
+    frames = []
+    for i in range(count):
+        cx = width // 2 + int(width / 4 * np.sin(i / 15))
+        cy = height // 2
+        mask = (x - cx) ** 2 + (y - cy) ** 2 < (height // 4) ** 2
+        frame = background.copy()
+        frame[mask] = (224, 172, 140)
+        buf = io.BytesIO()
+        Image.fromarray(frame.astype(np.uint8)).save(buf, format='JPEG', quality=quality)
+        frames.append(buf.getvalue())
+    return frames
+
+
+async def run(url, frames, fps, duration):
+    sent_at = {}
+    lags = []
+    last = {}
+    interval = 1.0 / fps
+    total = int(fps * duration)
+
+    async with websockets.connect(url, max_size=None) as ws:
+        async def send():
+            start = time.perf_counter()
+            for i in range(total):
+                await asyncio.sleep(max(0.0, start + i * interval - time.perf_counter()))
+                sent_at[i] = time.perf_counter()
+                await ws.send(frames[i % len(frames)])
+
+        async def receive():
+            async for message in ws:
+                result = json.loads(message)
+                lags.append((time.perf_counter() - sent_at[result['frame']]) * 1000.0)
+                last.update(result)
+                if result['frame'] == total - 1 or len(lags) + result['dropped'] >= total:
+                    return
+
+        start = time.perf_counter()
+        sender = asyncio.create_task(send())
+        try:
+            await asyncio.wait_for(receive(), duration + 30)
+        except asyncio.TimeoutError:
+            pass
+        await sender
+        elapsed = time.perf_counter() - start
+    return total, lags, last.get('dropped', 0), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='ws://localhost:8000/sentiment/stream?model=model_a')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(60, args.width, args.height)
+    total, lags, dropped, elapsed = asyncio.run(run(args.url, frames, args.fps, args.duration))
+    p50, p99 = np.percentile(lags, [50, 99]) if lags else (float('nan'), float('nan'))
+    print(f"sent {total} frames at {args.fps:.0f} fps ({args.width}x{args.height})")
+    print(f"processed {len(lags)} frames, {len(lags) / elapsed:.1f} fps sustained, "
+          f"{dropped} dropped by the server")
+    print(f"lag p50 {p50:.1f} ms  p99 {p99:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Peak server memory (RSS) while many large uploads arrive at once.
+
+Serves app.py with uvicorn in a child process (stand-in models for any model
+without weights, result cache off) and posts camera-sized JPEGs to
+/sentiment/image/ at the given concurrency, sampling the server's resident
+memory from /proc while the requests run. It also checks that an upload over
+MAX_UPLOAD_BYTES is refused with 413, and how quickly. Linux only.
+
+    python benchmarks/bench_uploads.py --concurrency 32 --megapixels 12
+    MAX_UPLOAD_BYTES=4194304 python benchmarks/bench_uploads.py
+"""
+import argparse
+import asyncio
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = r'''
+import sys
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[2])
+import uvicorn
+import app
+from standins import use_standins
+use_standins(app.registry, sys.argv[3])
+uvicorn.run(app.app, host='127.0.0.1', port=int(sys.argv[4]), log_level='warning')
+'''
+
+
+def camera_jpeg(megapixels, quality, seed=0):
+    # Smooth gradients plus sensor-like noise: compresses about as badly as a photo
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def memory_kb(pid, field):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+class RssSampler:
+    """Polls the resident memory of a process in a background thread."""
+
+    def __init__(self, pid, interval=0.005):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, memory_kb(self.pid, 'VmRSS'))
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(standins):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, RESULT_CACHE_SIZE='0')
+    env.pop('RESULT_CACHE_PATH', None)
+    server = subprocess.Popen(
+        [sys.executable, '-c', SERVER, ROOT, os.path.join(ROOT, 'benchmarks'), standins, str(port)],
+        cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"Server exited with status {server.returncode}")
+        try:
+            httpx.get(base_url + '/cache/stats', timeout=1)
+            return server, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit("Server did not start within 120 s")
+
+
+async def upload_burst(base_url, image, model, requests, concurrency):
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def one():
+            async with semaphore:
+                response = await client.post('/sentiment/image/', data={'model': model},
+                                             files={'file': ('camera.jpg', image, 'image/jpeg')})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return statuses, time.perf_counter() - start
+
+
+def oversized_upload(base_url, size, model):
+    start = time.perf_counter()
+    try:
+        response = httpx.post(base_url + '/sentiment/image/', data={'model': model},
+                              files={'file': ('huge.jpg', b'\0' * size, 'image/jpeg')}, timeout=60)
+        status = response.status_code
+    except httpx.TransportError as e:
+        # The server may answer and close before the client has sent everything
+        status = type(e).__name__
+    return status, (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='model_a')
+    parser.add_argument('--standins', choices=['auto', 'always', 'never'], default='auto')
+    parser.add_argument('--megapixels', type=float, default=12.0)
+    parser.add_argument('--quality', type=int, default=92)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--oversize-mb', type=float, default=64.0)
+    args = parser.parse_args()
+
+    image = camera_jpeg(args.megapixels, args.quality)
+    print(f"upload: {args.megapixels:g} MP JPEG, {len(image) / 1e6:.1f} MB, model {args.model}")
+
+    server, base_url = start_server(args.standins)
+    try:
+        # One request first, so model loading is not counted in the peaks
+        asyncio.run(upload_burst(base_url, image, args.model, 1, 1))
+        idle_kb = memory_kb(server.pid, 'VmRSS')
+        print(f"server RSS after warm-up: {idle_kb / 1024:.0f} MB")
+
+        for concurrency in args.concurrency:
+            with RssSampler(server.pid) as sampler:
+                statuses, elapsed = asyncio.run(
+                    upload_burst(base_url, image, args.model, args.requests, concurrency))
+            in_flight = concurrency * len(image) / 1e6
+            print(f"concurrency {concurrency:3d}: peak RSS {sampler.peak_kb / 1024:7.0f} MB "
+                  f"(+{(sampler.peak_kb - idle_kb) / 1024:.0f} MB over idle, {in_flight:.0f} MB of uploads "
+                  f"in flight), {args.requests / elapsed:6.1f} req/s, statuses {statuses}")
+
+        status, elapsed_ms = oversized_upload(base_url, int(args.oversize_mb * 1e6), args.model)
+        print(f"oversized upload ({args.oversize_mb:g} MB): {status} after {elapsed_ms:.0f} ms")
+        print(f"server peak RSS over the run (VmHWM): {memory_kb(server.pid, 'VmHWM') / 1024:.0f} MB")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
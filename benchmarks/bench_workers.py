@@ -0,0 +1,141 @@
+"""Throughput and memory of the gunicorn deployment from 1 to N workers.
+
+Starts gunicorn with gunicorn.conf.py for each worker count, serving app.py
+with stand-in models for any model without weights (benchmarks/standin_app.py)
+and the result cache off, then posts the same image from many concurrent
+clients. Memory is reported as the RSS summed over the master and workers,
+which counts shared pages once per process, and as the PSS sum, which
+splits them between the processes sharing them: the gap is what preloading
+the weights in the master saves. Linux only.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --model model_c
+"""
+import argparse
+import asyncio
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_image(width=640, height=480):
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def memory_kb(pid, path, field):
+    try:
+        with open(f'/proc/{pid}/{path}') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+def process_tree(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.extend(int(child) for child in f.read().split())
+    return [pid] + children
+
+
+def start_gunicorn(workers, standins):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, API_WORKERS=str(workers), API_BIND=f'127.0.0.1:{port}',
+               STANDINS=standins, RESULT_CACHE_SIZE='0')
+    env.pop('RESULT_CACHE_PATH', None)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--pythonpath', 'benchmarks', '--log-level', 'warning', 'standin_app:app'],
+        cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"gunicorn exited with status {server.returncode}")
+        if len(process_tree(server.pid)) > workers:
+            try:
+                httpx.get(base_url + '/cache/stats', timeout=1)
+                return server, base_url
+            except httpx.TransportError:
+                pass
+        time.sleep(0.1)
+    server.kill()
+    sys.exit("gunicorn did not start within 180 s")
+
+
+async def load_test(base_url, image, model, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    latencies = []
+    failed = 0
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            nonlocal failed
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post('/sentiment/image/', data={'model': model},
+                                             files={'file': ('frame.jpg', image, 'image/jpeg')})
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - start) * 1000.0)
+                else:
+                    failed += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start), latencies, failed
+
+
+def main():
+    cores = len(os.sched_getaffinity(0))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= cores], cores}))
+    parser.add_argument('--model', default='model_c')
+    parser.add_argument('--standins', choices=['auto', 'always', 'never'], default='auto')
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    image = test_image()
+    print(f"{cores} cores available, model {args.model}, concurrency {args.concurrency}")
+    print(f"{'workers':>7s} {'req/s':>8s} {'speedup':>8s} {'p50 ms':>8s} {'p99 ms':>8s} "
+          f"{'RSS sum MB':>11s} {'PSS sum MB':>11s} {'failed':>6s}")
+    single = None
+    for workers in args.workers:
+        server, base_url = start_gunicorn(workers, args.standins)
+        try:
+            # Every worker loads what it did not get from the master before timing
+            asyncio.run(load_test(base_url, image, args.model, 4 * workers, workers))
+            rate, latencies, failed = asyncio.run(
+                load_test(base_url, image, args.model, args.requests, args.concurrency))
+            pids = process_tree(server.pid)
+            rss = sum(memory_kb(pid, 'status', 'VmRSS') for pid in pids) / 1024
+            pss = sum(memory_kb(pid, 'smaps_rollup', 'Pss') for pid in pids) / 1024
+        finally:
+            server.terminate()
+            server.wait()
+        single = single or rate
+        p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (float('nan'),) * 2
+        print(f"{workers:7d} {rate:8.1f} {rate / single:7.2f}x {p50:8.1f} {p99:8.1f} "
+              f"{rss:11.0f} {pss:11.0f} {failed:6d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""app.py served with stand-in models, for benchmarks that start a real server.
+
+    gunicorn -c gunicorn.conf.py --pythonpath benchmarks standin_app:app
+
+STANDINS picks which models are replaced: 'auto' (default, those without
+weights), 'always' or 'never'.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as api  # noqa: E402
+from standins import use_standins  # noqa: E402
+
+use_standins(api.registry, os.getenv('STANDINS', 'auto'))
+app = api.app
@@ -0,0 +1,42 @@
+"""Small numpy stand-ins for the served models, for benchmarking without weights.
+
+They take the same inputs and return the same (N, 8) probabilities as the
+real models, at a fixed, deterministic cost: one dense projection for the
+Keras CNNs and a wider two-layer one for the ViT, so model_c stays the most
+expensive model as in production.
+"""
+import os
+
+import numpy as np
+
+from config import MODEL_PATHS
+from models import MODEL_FRAMEWORKS, softmax
+from preprocessing import KERAS_SIZE, VIT_SIZE
+
+HIDDEN = {'keras': 32, 'torch': 256}
+
+
+def load_standin(model_id):
+    framework = MODEL_FRAMEWORKS[model_id]
+    size = KERAS_SIZE if framework == 'keras' else VIT_SIZE
+    rng = np.random.default_rng(sum(map(ord, model_id)))
+    w1 = rng.normal(0, 0.01, (size * size * 3, HIDDEN[framework])).astype(np.float32)
+    w2 = rng.normal(0, 0.1, (HIDDEN[framework], 8)).astype(np.float32)
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        hidden = np.maximum(batch.reshape(len(batch), -1) @ w1, 0)
+        return softmax(hidden @ w2)
+    return predict
+
+
+def use_standins(registry, mode='auto'):
+    """Swaps stand-ins into a registry; 'auto' only for models without weights.
+
+    Returns the ids of the models now served by stand-ins.
+    """
+    replaced = []
+    for model_id in registry.ids():
+        if mode == 'always' or (mode == 'auto' and not os.path.exists(MODEL_PATHS[model_id])):
+            registry.register(model_id, 'standin', lambda model_id=model_id: load_standin(model_id))
+            replaced.append(model_id)
+    return replaced
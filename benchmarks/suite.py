@@ -0,0 +1,263 @@
+"""Reproducible API benchmark suite with a latency regression check.
+
+Runs app.py in-process (through httpx's ASGI transport) with the result
+cache disabled, and uses stand-in models (benchmarks/standins.py) for any
+model whose weights are missing. It measures:
+
+- cold start: importing the app and serving the first request, in a fresh process
+- latency of single requests to /sentiment/image/ per model
+- throughput of /sentiment/image/ at several concurrency levels
+- throughput of /sentiment/images/ at several batch sizes
+
+Results are written as JSON: a flat map of metric name to value, plus
+details of the environment. Names ending in _ms or _s are lower-is-better
+and names ending in _per_s are higher-is-better. --compare flags every
+metric that got worse than a stored baseline by more than --threshold
+and exits with status 1 if there is any.
+
+    python benchmarks/suite.py --output bench_results.json
+    python benchmarks/suite.py --compare bench_baseline.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every request must reach the model
+os.environ['RESULT_CACHE_SIZE'] = '0'
+os.environ.pop('RESULT_CACHE_PATH', None)
+
+import numpy as np  # noqa: E402
+
+MODELS = ['model_a', 'model_b', 'model_c']
+
+COLD_START = r'''
+import os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[3])
+import httpx
+import app
+from standins import use_standins
+use_standins(app.registry, sys.argv[2])
+image = open(sys.argv[4], 'rb').read()
+
+async def first_request():
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        response = await client.post('/sentiment/image/', data={'model': sys.argv[1]},
+                                     files={'file': ('frame.jpg', image, 'image/jpeg')})
+        response.raise_for_status()
+
+import asyncio
+asyncio.run(first_request())
+print(time.perf_counter() - start)
+'''
+
+
+def generated_images(count, width=640, height=480):
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    images = []
+    for i in range(count):
+        base = np.stack([(x + 37 * i) % 256, (y + 11 * i) % 256, np.full_like(x, 40 * i % 256)], -1)
+        noisy = np.clip(base + rng.normal(0, 10, base.shape), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(noisy).save(buf, format='JPEG', quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def sample_images():
+    images = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'samples', '*.png'))):
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def cold_start(model, standins, image, repeats):
+    fd, path = tempfile.mkstemp(suffix='.jpg')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image)
+        times = []
+        for _ in range(repeats):
+            output = subprocess.run(
+                [sys.executable, '-c', COLD_START, model, standins,
+                 os.path.dirname(os.path.abspath(__file__)), path],
+                cwd=ROOT, capture_output=True, text=True)
+            if output.returncode != 0:
+                sys.exit(output.stderr)
+            times.append(float(output.stdout.strip().splitlines()[-1]))
+        return float(np.median(times))
+    finally:
+        os.remove(path)
+
+
+async def post_image(client, image, model):
+    response = await client.post('/sentiment/image/', data={'model': model},
+                                 files={'file': ('frame.jpg', image, 'image/jpeg')})
+    response.raise_for_status()
+
+
+async def measure_latency(client, images, model, requests):
+    await post_image(client, images[0], model)  # load the model first
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await post_image(client, images[i % len(images)], model)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return np.percentile(latencies, [50, 95])
+
+
+async def measure_throughput(client, images, model, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await post_image(client, images[i % len(images)], model)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def measure_batch_throughput(client, images, model, batch_size, rounds):
+    files = [('files', (f'{i}.jpg', images[i % len(images)], 'image/jpeg')) for i in range(batch_size)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = await client.post('/sentiment/images/', data={'model': model}, files=files)
+        response.raise_for_status()
+    return batch_size * rounds / (time.perf_counter() - start)
+
+
+async def run_in_process(app, args, images):
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        for model in args.models:
+            p50, p95 = await measure_latency(client, images, model, args.requests)
+            results[f'latency.{model}.p50_ms'] = float(p50)
+            results[f'latency.{model}.p95_ms'] = float(p95)
+            for concurrency in args.concurrency:
+                rate = await measure_throughput(client, images, model, args.requests, concurrency)
+                results[f'throughput.{model}.concurrency_{concurrency}.img_per_s'] = rate
+            for batch_size in args.batch_sizes:
+                rounds = max(1, args.requests // batch_size)
+                rate = await measure_batch_throughput(client, images, model, batch_size, rounds)
+                results[f'batch.{model}.size_{batch_size}.img_per_s'] = rate
+    return results
+
+
+def environment(standin_models):
+    versions = {}
+    for package in ('numpy', 'fastapi', 'starlette', 'PIL', 'cv2', 'keras', 'tensorflow',
+                    'torch', 'onnxruntime'):
+        try:
+            module = __import__(package)
+            versions[package] = getattr(module, '__version__', 'unknown')
+        except ImportError:
+            pass
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+        'standin_models': standin_models,
+        'packages': versions,
+        'config': {k: v for k, v in os.environ.items()
+                   if k.startswith(('MAX_BATCH', 'WORKER_', 'INFERENCE_', 'ORT_', 'REDUCED_'))},
+    }
+
+
+def lower_is_better(name):
+    return name.endswith(('_ms', '_s')) and not name.endswith('_per_s')
+
+
+def compare(results, baseline, threshold):
+    """Prints each shared metric against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\n{'metric':58s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name in sorted(set(results) & set(baseline)):
+        old, new = baseline[name], results[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = change > threshold if lower_is_better(name) else change < -threshold
+        flag = '  REGRESSION' if worse else ''
+        print(f"{name:58s} {old:10.2f} {new:10.2f} {change:+8.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', default=MODELS, choices=MODELS)
+    parser.add_argument('--images', choices=['generated', 'samples'], default='generated')
+    parser.add_argument('--standins', choices=['auto', 'always', 'never'], default='auto',
+                        help="Stand-in models: only without weights (auto), always or never")
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--cold-start-runs', type=int, default=3)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative change counted as a regression')
+    args = parser.parse_args()
+
+    images = sample_images() if args.images == 'samples' else generated_images(8)
+
+    import app
+    from standins import use_standins
+    standin_models = use_standins(app.registry, args.standins)
+    if standin_models:
+        print(f"stand-in models: {', '.join(standin_models)}")
+
+    results = {}
+    for model in args.models:
+        results[f'cold_start.{model}_s'] = cold_start(model, args.standins, images[0],
+                                                      args.cold_start_runs)
+    results.update(asyncio.run(run_in_process(app.app, args, images)))
+
+    for name, value in results.items():
+        print(f"{name:58s} {value:10.2f}")
+
+    report = {'environment': environment(standin_models), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import os
+
+# Settings for the API, overridable through environment variables
+
+# Micro-batching: how many requests are grouped into one forward pass and
+# how long (in milliseconds) the first request may wait for others to join
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '16'))
+MAX_BATCH_WAIT_MS = float(os.getenv('MAX_BATCH_WAIT_MS', '5'))
+
+# Worker pool for image decoding and preprocessing ('thread' or 'process').
+# Requests beyond WORKER_POOL_SIZE + WORKER_QUEUE_SIZE get a 503 with
+# Retry-After instead of waiting; the same limit bounds each model's queue
+WORKER_POOL_KIND = os.getenv('WORKER_POOL_KIND', 'thread')
+WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', str(os.cpu_count() or 1)))
+WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', '64'))
+RETRY_AFTER_SECONDS = int(os.getenv('RETRY_AFTER_SECONDS', '1'))
+
+# Batch endpoint: most images accepted per request and how many are decoded
+# and sent to the model together. Starlette's form parser refuses more than
+# 1000 uploaded files on its own, so a higher limit only applies to archives
+MAX_IMAGES_PER_REQUEST = int(os.getenv('MAX_IMAGES_PER_REQUEST', '1000'))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '64'))
+
+# Model weights, loaded on first use. At most MAX_RESIDENT_MODELS stay in
+# memory (least recently used is evicted); WARMUP_MODELS is a comma separated
+# list of model ids loaded at startup instead of on the first request
+MODEL_PATHS = {
+    'model_a': os.getenv('MODEL_A_PATH', 'modelo_affect_net.h5'),
+    'model_b': os.getenv('MODEL_B_PATH', 'modelo_affect_net_20_epocas.h5'),
+    'model_c': os.getenv('MODEL_C_PATH', 'VIT-modelo.pth'),
+}
+MAX_RESIDENT_MODELS = int(os.getenv('MAX_RESIDENT_MODELS', '3'))
+WARMUP_MODELS = [m.strip() for m in os.getenv('WARMUP_MODELS', '').split(',') if m.strip()]
+
+# Result cache keyed by a hash of the uploaded bytes and the model id.
+# RESULT_CACHE_SIZE=0 disables it; RESULT_CACHE_TTL is in seconds (0 = no
+# expiry). With RESULT_CACHE_PATH set, results go to a sqlite file that
+# survives restarts and is shared by the workers on the same host
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '3600'))
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '')
+
+# Decode at reduced resolution when the model input is much smaller than the
+# upload (JPEG draft mode, box reduction for other formats); set to 0 to
+# always decode at full size
+REDUCED_DECODE = os.getenv('REDUCED_DECODE', '1') == '1'
+
+# Ensemble (model=ensemble or /sentiment/image/all): weight of each model in
+# the fused prediction and how long to wait for it, e.g. "model_c:2" and
+# "model_c:800". Models missing from the maps use weight 1 and
+# ENSEMBLE_TIMEOUT_MS
+def _parse_model_map(value):
+    pairs = (item.split(':', 1) for item in value.split(',') if ':' in item)
+    return {model.strip(): float(number) for model, number in pairs}
+
+ENSEMBLE_WEIGHTS = _parse_model_map(os.getenv('ENSEMBLE_WEIGHTS', ''))
+ENSEMBLE_TIMEOUT_MS = float(os.getenv('ENSEMBLE_TIMEOUT_MS', '1000'))
+ENSEMBLE_TIMEOUTS_MS = _parse_model_map(os.getenv('ENSEMBLE_TIMEOUTS_MS', ''))
+
+# Inference backend: 'native' (Keras/PyTorch) or 'onnx' (ONNX Runtime, using
+# the files written by export_onnx.py into ONNX_DIR). With ONNX_USE_INT8=1 a
+# quantised <model>.int8.onnx is preferred when present. ORT thread counts of
+# 0 let ONNX Runtime decide
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'native')
+ONNX_DIR = os.getenv('ONNX_DIR', 'onnx')
+ONNX_USE_INT8 = os.getenv('ONNX_USE_INT8', '1') == '1'
+ORT_INTRA_OP_THREADS = int(os.getenv('ORT_INTRA_OP_THREADS', '0'))
+ORT_INTER_OP_THREADS = int(os.getenv('ORT_INTER_OP_THREADS', '1'))
+
+# Forward passes run at once (INFERENCE_WORKERS, at most one per model) and
+# threads used by each in PyTorch, TensorFlow and ONNX Runtime
+# (INFERENCE_THREADS, unless ORT_INTRA_OP_THREADS is set). 0 keeps each
+# framework's default of one per core; gunicorn.conf.py fits both to the
+# cores of one worker
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '3'))
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', '0'))
+
+# WebSocket streaming: frames waiting beyond STREAM_MAX_PENDING are dropped
+# (oldest first) so latency stays bounded when inference falls behind;
+# predictions are smoothed over the last STREAM_SMOOTHING_WINDOW frames
+STREAM_MAX_PENDING = int(os.getenv('STREAM_MAX_PENDING', '4'))
+STREAM_SMOOTHING_WINDOW = int(os.getenv('STREAM_SMOOTHING_WINDOW', '5'))
+
+# Face detection ahead of the classifiers (/sentiment/faces/). FACE_DETECTION=0
+# turns the stage off and classifies the whole image as one face. Detector:
+# OpenCV's YuNet if FACE_YUNET_MODEL points to its .onnx file, else the res10
+# SSD if both of its files are given, else the Haar cascade bundled with
+# opencv-python 4.x
+FACE_DETECTION = os.getenv('FACE_DETECTION', '1') == '1'
+FACE_YUNET_MODEL = os.getenv('FACE_YUNET_MODEL', '')
+FACE_DNN_PROTOTXT = os.getenv('FACE_DNN_PROTOTXT', '')
+FACE_DNN_WEIGHTS = os.getenv('FACE_DNN_WEIGHTS', '')
+FACE_MIN_CONFIDENCE = float(os.getenv('FACE_MIN_CONFIDENCE', '0.5'))
+FACE_DETECTION_MAX_SIDE = int(os.getenv('FACE_DETECTION_MAX_SIDE', '640'))
+FACE_CROP_MARGIN = float(os.getenv('FACE_CROP_MARGIN', '0.15'))
+MAX_FACES = int(os.getenv('MAX_FACES', '32'))
+
+# Upload limits. Request bodies over MAX_UPLOAD_BYTES (MAX_BATCH_UPLOAD_BYTES
+# for /sentiment/images/) are refused with 413 before being read in full, and
+# so are images whose header declares more than MAX_IMAGE_PIXELS pixels,
+# before any pixel data is decoded
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv('MAX_BATCH_UPLOAD_BYTES', str(256 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', '40000000'))
+
+# User feedback (POST /feedback/), kept in a sqlite file for retraining.
+# Records are buffered in memory and written every FEEDBACK_FLUSH_SECONDS or
+# every FEEDBACK_BATCH_SIZE records; past FEEDBACK_MAX_PENDING buffered
+# records new feedback gets a 503. FEEDBACK_PATH='' turns the endpoint off
+FEEDBACK_PATH = os.getenv('FEEDBACK_PATH', 'feedback.sqlite3')
+FEEDBACK_BATCH_SIZE = int(os.getenv('FEEDBACK_BATCH_SIZE', '256'))
+FEEDBACK_FLUSH_SECONDS = float(os.getenv('FEEDBACK_FLUSH_SECONDS', '1'))
+FEEDBACK_MAX_PENDING = int(os.getenv('FEEDBACK_MAX_PENDING', '10000'))
+
+# Request scheduling on /sentiment/image/ (form fields deadline_ms and
+# priority). A request that its model is not expected to answer within the
+# deadline goes to the model's fallbacks, tried in order, e.g.
+# "model_c:model_a,model_c:model_b" (the ViT behind model_c costs several
+# times a Keras CNN). Expected waits come from moving averages of the batch
+# and preprocessing times, weighted by SCHEDULER_EWMA_ALPHA. In the batching
+# queues a priority level is worth PRIORITY_AGING_MS of waiting, so low
+# priority requests are delayed, never starved
+def _parse_fallbacks(value):
+    fallbacks = {}
+    for item in value.split(','):
+        if ':' in item:
+            model, fallback = item.split(':', 1)
+            fallbacks.setdefault(model.strip(), []).append(fallback.strip())
+    return fallbacks
+
+MODEL_FALLBACKS = _parse_fallbacks(os.getenv('MODEL_FALLBACKS', 'model_c:model_a,model_c:model_b'))
+SCHEDULER_EWMA_ALPHA = float(os.getenv('SCHEDULER_EWMA_ALPHA', '0.2'))
+PRIORITY_AGING_MS = float(os.getenv('PRIORITY_AGING_MS', '1000'))
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def fuse(probabilities, weights=None):
+    """Weighted mean of the class probabilities of several models.
+
+    ``probabilities`` maps model id to its probability vector; models missing
+    from ``weights`` count with weight 1.
+    """
+    weights = weights or {}
+    models = list(probabilities)
+    stacked = np.stack([np.asarray(probabilities[m], dtype=np.float32) for m in models])
+    w = np.array([weights.get(m, 1.0) for m in models], dtype=np.float32)
+    if w.sum() <= 0:
+        w = np.ones_like(w)
+    return (w[:, None] * stacked).sum(axis=0) / w.sum()
@@ -0,0 +1,94 @@
+"""Exports the feedback collected by the API (POST /feedback/) as training data.
+
+    python export_feedback.py --output feedback.csv
+    python export_feedback.py --db feedback.sqlite3 --output feedback_parquet --images data/uploads
+
+Rows are streamed out of the sqlite store in id order, --chunk-size at a
+time, and appended to a CSV file or written as Parquet part files (an output
+without .csv is a Parquet directory), so the store is never loaded whole.
+Exporting again to the same output only adds the feedback received since
+the last run; the API may keep writing meanwhile.
+
+Each row gets a training label: the corrected class, or the predicted one
+when the user confirmed it. Rows without one (marked wrong but not
+corrected) are left out unless --include-unlabelled. The API never stores
+images, so with --images every file under that folder is hashed like the
+API does and matching rows get its path.
+"""
+import argparse
+import glob
+import os
+import sys
+
+from archives import is_image_name
+from feedback_store import iter_feedback
+from result_cache import content_digest
+from serialization import CLASS_NAMES
+from table_outputs import CsvOutput, ParquetOutput
+
+SCHEMA = [
+    ('id', 'int64'), ('received', 'float64'), ('image_hash', 'string'), ('model', 'string'),
+    ('predicted', 'int64'), ('corrected', 'int64'), ('correct', 'bool_'), ('comments', 'string'),
+    ('latency_ms', 'float64'), ('label', 'int64'), ('label_name', 'string'), ('path', 'string'),
+]
+
+
+def training_label(record):
+    if record['corrected'] is not None:
+        return record['corrected']
+    return record['predicted'] if record['correct'] else None
+
+
+def hash_images(folder):
+    """Maps the upload digest of every image under ``folder`` to its path."""
+    paths = {}
+    for path in sorted(glob.glob(os.path.join(folder, '**', '*'), recursive=True)):
+        if os.path.isfile(path) and is_image_name(path):
+            with open(path, 'rb') as f:
+                paths.setdefault(content_digest(f), path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.getenv('FEEDBACK_PATH', 'feedback.sqlite3'),
+                        help='Feedback store written by the API')
+    parser.add_argument('--output', required=True, help='.csv file, or a Parquet directory')
+    parser.add_argument('--images', help='Folder of the analysed images, matched by hash')
+    parser.add_argument('--include-unlabelled', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"No feedback store at {args.db}")
+    if args.output.endswith('.csv'):
+        output = CsvOutput(args.output, SCHEMA)
+    else:
+        output = ParquetOutput(args.output, SCHEMA)
+    since = max((int(row['id']) for row in output.read(['id'])), default=0)
+    paths = hash_images(args.images) if args.images else {}
+
+    exported = skipped = 0
+    rows = []
+    for record in iter_feedback(args.db, since, args.chunk_size):
+        label = training_label(record)
+        if label is None and not args.include_unlabelled:
+            skipped += 1
+            continue
+        rows.append(dict(record, label=label,
+                         label_name=CLASS_NAMES[label] if label is not None else None,
+                         path=paths.get(record['image_hash'])))
+        if len(rows) >= args.chunk_size:
+            output.write(rows)
+            exported += len(rows)
+            rows = []
+    if rows:
+        output.write(rows)
+        exported += len(rows)
+
+    print(f"Exported {exported} rows after id {since} to {args.output}"
+          f" ({skipped} without a label left out)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Exports the served models to ONNX for INFERENCE_BACKEND=onnx.
+
+    python export_onnx.py                   # all models into onnx/
+    python export_onnx.py --quantize        # also write model_c.int8.onnx
+    python export_onnx.py --models model_c --output-dir /tmp/onnx
+
+Keras models are converted with tf2onnx, the ViT with torch.onnx.export.
+Every export has a dynamic batch dimension. --quantize applies ONNX
+Runtime dynamic INT8 quantisation (weights in INT8, activations quantised
+at run time) to the ViT, whose MatMul-heavy layers benefit the most.
+"""
+import argparse
+import os
+
+from config import MODEL_PATHS
+from models import MODEL_FRAMEWORKS
+from preprocessing import KERAS_SIZE, VIT_SIZE
+
+OPSET = 17
+
+
+def export_keras(source, target):
+    import tensorflow as tf
+    import tf2onnx
+    from keras.models import load_model
+
+    model = load_model(source)
+    spec = (tf.TensorSpec((None, KERAS_SIZE, KERAS_SIZE, 3), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=OPSET, output_path=target)
+
+
+def export_vit(source, target):
+    import torch
+
+    model = torch.load(source, map_location=torch.device('cpu'), weights_only=False)
+    model.eval()
+    dummy = torch.zeros(1, 3, VIT_SIZE, VIT_SIZE)
+    torch.onnx.export(
+        model, dummy, target,
+        input_names=['input'], output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=OPSET,
+    )
+
+
+def quantize(source, target):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', default=list(MODEL_FRAMEWORKS),
+                        choices=list(MODEL_FRAMEWORKS))
+    parser.add_argument('--output-dir', default='onnx')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Also write a dynamic INT8 version of the ViT (model_c)')
+    parser.add_argument('--quantize-all', action='store_true',
+                        help='Write INT8 versions of every exported model')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for model_id in args.models:
+        target = os.path.join(args.output_dir, f'{model_id}.onnx')
+        if MODEL_FRAMEWORKS[model_id] == 'keras':
+            export_keras(MODEL_PATHS[model_id], target)
+        else:
+            export_vit(MODEL_PATHS[model_id], target)
+        print(f"{model_id}: {target} ({os.path.getsize(target) / 1e6:.1f} MB)")
+
+        if args.quantize_all or (args.quantize and MODEL_FRAMEWORKS[model_id] == 'torch'):
+            quantized = os.path.join(args.output_dir, f'{model_id}.int8.onnx')
+            quantize(target, quantized)
+            print(f"{model_id}: {quantized} ({os.path.getsize(quantized) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
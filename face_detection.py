@@ -0,0 +1,138 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import (
+    FACE_CROP_MARGIN, FACE_DETECTION_MAX_SIDE, FACE_DNN_PROTOTXT, FACE_DNN_WEIGHTS,
+    FACE_MIN_CONFIDENCE, FACE_YUNET_MODEL, MAX_FACES,
+)
+from metrics import observe
+from preprocessing import open_image, resize_for
+
+
+class FaceDetector:
+    """Finds faces on the CPU with OpenCV.
+
+    Uses YuNet when its model file is given, the res10 SSD network when its
+    prototxt and weights are given, and the Haar cascade shipped with
+    opencv-python 4.x otherwise. OpenCV detectors must not be shared between
+    threads, so each worker thread gets its own.
+    """
+
+    def __init__(self, yunet_model='', prototxt='', weights='', min_confidence=0.5):
+        if yunet_model:
+            self.backend = 'yunet'
+        elif prototxt and weights:
+            self.backend = 'ssd'
+        else:
+            self.backend = 'haar'
+        self.yunet_model = yunet_model
+        self.prototxt = prototxt
+        self.weights = weights
+        self.min_confidence = min_confidence
+        self._local = threading.local()
+
+    def _model(self):
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            if self.backend == 'yunet':
+                model = cv2.FaceDetectorYN.create(self.yunet_model, '', (320, 320),
+                                                  self.min_confidence)
+            elif self.backend == 'ssd':
+                model = cv2.dnn.readNetFromCaffe(self.prototxt, self.weights)
+            elif hasattr(cv2, 'CascadeClassifier'):
+                model = cv2.CascadeClassifier(
+                    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            else:
+                raise RuntimeError("This OpenCV build has no Haar cascades; "
+                                   "set FACE_YUNET_MODEL to a YuNet .onnx file")
+            self._local.model = model
+        return model
+
+    def detect(self, rgb: np.ndarray):
+        """Returns face boxes as (x, y, w, h) in pixels of ``rgb``."""
+        height, width = rgb.shape[:2]
+        if self.backend == 'yunet':
+            model = self._model()
+            model.setInputSize((width, height))
+            _, faces = model.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+            if faces is None:
+                return []
+            boxes = []
+            for x, y, w, h in faces[:, :4]:
+                x1, y1 = max(0, int(x)), max(0, int(y))
+                x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+                if x2 > x1 and y2 > y1:
+                    boxes.append((x1, y1, x2 - x1, y2 - y1))
+            return boxes
+
+        if self.backend == 'ssd':
+            blob = cv2.dnn.blobFromImage(rgb, 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=True)
+            net = self._model()
+            net.setInput(blob)
+            detections = net.forward()[0, 0]
+            boxes = []
+            for confidence, x1, y1, x2, y2 in detections[:, 2:7]:
+                if confidence < self.min_confidence:
+                    continue
+                x1, x2 = int(max(0, x1) * width), int(min(1, x2) * width)
+                y1, y2 = int(max(0, y1) * height), int(min(1, y2) * height)
+                if x2 > x1 and y2 > y1:
+                    boxes.append((x1, y1, x2 - x1, y2 - y1))
+            return boxes
+
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        min_side = max(24, min(width, height) // 12)
+        faces = self._model().detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+detector = FaceDetector(FACE_YUNET_MODEL, FACE_DNN_PROTOTXT, FACE_DNN_WEIGHTS, FACE_MIN_CONFIDENCE)
+
+
+def crop_box(box, width, height, margin):
+    # Widen the box a little: the classifiers were trained on loose face crops
+    x, y, w, h = box
+    dx, dy = int(w * margin), int(h * margin)
+    x1, y1 = max(0, x - dx), max(0, y - dy)
+    x2, y2 = min(width, x + w + dx), min(height, y + h + dy)
+    return x1, y1, x2, y2
+
+
+def detect_faces(source, model: str, kind: str, detect=True):
+    """Decodes an upload, finds its faces and resizes each crop for the model.
+
+    Runs on the worker pool. Returns the original image size, the face boxes
+    in original pixels and a uint8 stack of crops (None when no face). With
+    ``detect=False`` the whole image is treated as a single face.
+    """
+    start = time.perf_counter()
+    image = open_image(source)
+    original_size = image.size
+    # thumbnail() uses the reduced JPEG decode when it can
+    image.thumbnail((FACE_DETECTION_MAX_SIDE, FACE_DETECTION_MAX_SIDE))
+    image = image.convert('RGB')
+    rgb = np.asarray(image)
+    decoded = time.perf_counter()
+    observe('decode', model, decoded - start)
+
+    if detect:
+        boxes = detector.detect(rgb)[:MAX_FACES]
+        observe('detect', model, time.perf_counter() - decoded)
+    else:
+        boxes = [(0, 0, image.width, image.height)]
+
+    start = time.perf_counter()
+    crops = []
+    for box in boxes:
+        x1, y1, x2, y2 = crop_box(box, image.width, image.height, FACE_CROP_MARGIN if detect else 0)
+        crops.append(resize_for(image.crop((x1, y1, x2, y2)), kind))
+    observe('preprocess', model, time.perf_counter() - start)
+
+    # Boxes go back in the coordinates of the uploaded image
+    scale = original_size[0] / image.width
+    boxes = [[round(v * scale) for v in box] for box in boxes]
+    return original_size, boxes, np.stack(crops) if crops else None
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Columns of a feedback record, in table order. image_hash is the BLAKE2
+# digest the result cache uses (result_cache.content_digest), so feedback can
+# be joined back to the images without the API ever storing them
+FIELDS = ('received', 'image_hash', 'model', 'predicted', 'corrected', 'correct',
+          'comments', 'latency_ms')
+
+
+class FeedbackStore:
+    """Append-only sqlite store of user feedback, written in batches.
+
+    add() only appends to an in-memory buffer, so a request never waits on
+    the disk. A background thread writes the buffer in one transaction once
+    it holds ``batch_size`` records or every ``flush_interval`` seconds. At
+    most ``max_pending`` records wait in memory; past that add() refuses new
+    ones. The database runs in WAL mode, so exports read while the API
+    writes, and each process (e.g. gunicorn worker) writes through its own
+    connection and thread.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self._reset()
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, received REAL NOT NULL, "
+            "image_hash TEXT NOT NULL, model TEXT NOT NULL, predicted INTEGER NOT NULL, "
+            "corrected INTEGER, correct INTEGER NOT NULL, comments TEXT, latency_ms REAL)"
+        )
+        db.close()
+        # The writer thread does not survive a fork (gunicorn's preload_app):
+        # a child starts its own on its first add()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def add(self, **record):
+        """Queues one record (see FIELDS); returns False if the buffer is full."""
+        record.setdefault('received', time.time())
+        with self._condition:
+            if self._closed or len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append(tuple(record.get(field) for field in FIELDS))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def _run(self):
+        db = self._connect()
+        try:
+            while True:
+                with self._condition:
+                    if not self._closed and len(self._pending) < self.batch_size:
+                        self._condition.wait(self.flush_interval)
+                    batch, self._pending = self._pending, []
+                    closed = self._closed
+                if batch:
+                    try:
+                        self._write(db, batch)
+                    except sqlite3.Error:
+                        # Feedback is best effort: never let it stop the writer
+                        if db.in_transaction:
+                            db.execute("ROLLBACK")
+                        with self._condition:
+                            self.dropped += len(batch)
+                if closed:
+                    return
+        finally:
+            db.close()
+
+    def _write(self, db, batch):
+        db.execute("BEGIN")
+        db.executemany(
+            f"INSERT INTO feedback ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+            batch)
+        db.execute("COMMIT")
+        with self._condition:
+            self.written += len(batch)
+
+    def close(self):
+        """Writes what is still buffered and stops the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "path": self.path,
+                "pending": len(self._pending),
+                "written": self.written,
+                "dropped": self.dropped,
+            }
+
+
+def iter_feedback(path, since_id=0, chunk_size=1000):
+    """Yields stored records as dicts (id plus FIELDS) in id order, ``chunk_size`` rows at a time."""
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = ('id',) + FIELDS
+        cursor = db.execute(
+            f"SELECT {', '.join(columns)} FROM feedback WHERE id > ? ORDER BY id", (since_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+import io
+
+from PIL import Image
+
+# Image handling for the Streamlit front end. The API squashes every image
+# to 96x96 (Keras models) or 224x224 (ViT), so nothing larger than
+# MODEL_INPUT_SIDE on the short side needs to be uploaded. The session
+# history keeps the last HISTORY_SIZE analyses as small JPEG thumbnails
+MODEL_INPUT_SIDE = 224
+UPLOAD_QUALITY = 90
+THUMBNAIL_SIDE = 128
+THUMBNAIL_QUALITY = 80
+HISTORY_SIZE = 20
+
+
+def downscale(image: Image.Image, side: int) -> Image.Image:
+    """Shrinks an image so its short side is ``side``; smaller images are kept as is."""
+    scale = side / min(image.size)
+    if scale >= 1:
+        return image
+    size = (max(side, round(image.width * scale)), max(side, round(image.height * scale)))
+    # reduce() first: a cheap integer box filter, then one resampling pass
+    factor = int(1 / scale) // 2
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(size, Image.BILINEAR)
+
+
+def encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def encode_for_upload(image: Image.Image) -> bytes:
+    """JPEG bytes of an image at the largest size any model uses."""
+    return encode_jpeg(downscale(image, MODEL_INPUT_SIDE), UPLOAD_QUALITY)
+
+
+def make_thumbnail(image: Image.Image) -> bytes:
+    """Small JPEG of an image for the session history."""
+    scale = THUMBNAIL_SIDE / max(image.size)
+    if scale < 1:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR)
+    return encode_jpeg(image, THUMBNAIL_QUALITY)
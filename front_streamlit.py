@@ -3,13 +3,37 @@ import requests
 from PIL import Image
 import io
 import os
+import time
 from streamlit_cropper import st_cropper
 
-# 1. Custom CSS
+from collections import deque
+
+from api_client import API_BASE_URL, ApiClient
+from front_images import HISTORY_SIZE, THUMBNAIL_SIDE, encode_for_upload, make_thumbnail
+
+# API client, created once per server process and shared by every rerun and
+# session, so analyses reuse its keep-alive connections. The API address
+# comes from API_BASE_URL in .streamlit/secrets.toml or the environment
+@st.cache_resource
+def get_api_client():
+    try:
+        base_url = st.secrets.get('API_BASE_URL', API_BASE_URL)
+    except FileNotFoundError:
+        base_url = API_BASE_URL
+    return ApiClient(base_url)
+
+# 1. Custom CSS, read from disk once and cached across reruns
+@st.cache_data
+def read_css(file_name):
+    if not os.path.exists(file_name):
+        return None
+    with open(file_name) as f:
+        return f.read()
+
 def local_css(file_name):
-    if os.path.exists(file_name):
-        with open(file_name) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    css = read_css(file_name)
+    if css is not None:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
     else:
         st.warning(f"No se encontró el archivo de estilos: {file_name}")
 
@@ -27,7 +51,7 @@ translations = {
         'feedback_title': 'Expresión detectada',
         'submit_feedback': 'Enviar retroalimentación',
         'select_model': 'Seleccionar modelo:',
-        'model_options': ['Modelo A', 'Modelo B', 'Modelo C'],  # Added Modelo C
+        'model_options': ['Modelo A', 'Modelo B', 'Modelo C', 'Ensamble (A + B + C)'],
         'ethical_disclaimer': 'Aviso: Al cargar o capturar una imagen, confirmas que tienes los derechos para hacerlo y que la imagen no viola ninguna política de privacidad. Las imágenes no se almacenarán en el servidor.',
         'documentation_title': 'Documentación',
         'documentation_content': """
@@ -139,7 +163,7 @@ Las imágenes no se almacenan en el servidor y solo se utilizan para el análisi
         'feedback_title': 'Detected Expression',
         'submit_feedback': 'Submit Feedback',
         'select_model': 'Select Model:',
-        'model_options': ['Model A', 'Model B', 'Model C'],  # Added Model C
+        'model_options': ['Model A', 'Model B', 'Model C', 'Ensemble (A + B + C)'],
         'ethical_disclaimer': 'Disclaimer: By uploading or capturing an image, you confirm that you have the rights to do so and that the image does not violate any privacy policies. The images will not be stored on the server.',
         'documentation_title': 'Documentation',
         'documentation_content': """
@@ -182,6 +206,19 @@ with st.sidebar:
     model_options = texts['model_options']
     selected_model = st.selectbox(texts['select_model'], model_options)
 
+model_mapping = {
+    'Modelo A': 'model_a',
+    'Modelo B': 'model_b',
+    'Modelo C': 'model_c',  # Added Model C
+    'Model A': 'model_a',
+    'Model B': 'model_b',
+    'Model C': 'model_c',  # Added Model C
+    'Ensamble (A + B + C)': 'ensemble',
+    'Ensemble (A + B + C)': 'ensemble'
+}
+model_id = model_mapping[selected_model]
+api = get_api_client()
+
 # 3. Main Title
 st.title(texts['title'])
 
@@ -224,15 +261,28 @@ else:
         'Neutral': 'neutral.png'
     }
 
-def load_sample_image(img_name):
+# Sample files are read once; their upload-sized JPEGs are encoded once
+@st.cache_data
+def read_sample(img_name):
     image_path = os.path.join('samples', img_name)
     if not os.path.exists(image_path):
-        st.error(f"Sample image not found: {image_path}")
+        return None
+    with open(image_path, 'rb') as f:
+        return f.read()
+
+@st.cache_data
+def sample_upload(img_name):
+    return encode_for_upload(Image.open(io.BytesIO(read_sample(img_name))))
+
+def load_sample_image(img_name):
+    contents = read_sample(img_name)
+    if contents is None:
+        st.error(f"Sample image not found: {os.path.join('samples', img_name)}")
         return None
     try:
-        return Image.open(image_path)
+        return Image.open(io.BytesIO(contents))
     except IOError:
-        st.error(f"Could not open image: {image_path}")
+        st.error(f"Could not open image: {os.path.join('samples', img_name)}")
         return None
 
 # 6. Handle Tabs
@@ -268,6 +318,22 @@ with tab1:
         if image:
             st.image(image, caption=texts['select_sample_image'], use_column_width=True)
 
+        # Every sample at once, sent together over the pooled connections
+        if st.button('Analizar todos los ejemplos' if selected_language == 'Español' else 'Analyze all samples'):
+            samples = [(name, sample_upload(file_name))
+                       for name, file_name in sample_images.items()
+                       if read_sample(file_name) is not None]
+            try:
+                results = api.predict_many(samples, model_id)
+            except requests.exceptions.RequestException as e:
+                st.error(f"Error: {e}")
+            else:
+                label = 'Ejemplo' if selected_language == 'Español' else 'Sample'
+                st.table([{
+                    label: name,
+                    texts['feedback_title']: class_to_idx.get(result.get('expresion', -1), result.get('error', '')),
+                } for (name, _), result in zip(samples, results)])
+
     st.info(texts['ethical_disclaimer'])
 
     # Proceed if an image is provided
@@ -280,72 +346,90 @@ with tab1:
             image = cropped_image
 
         # Analyze Image
-        model_mapping = {
-            'Modelo A': 'model_a',
-            'Modelo B': 'model_b',
-            'Modelo C': 'model_c',  # Added Model C
-            'Model A': 'model_a',
-            'Model B': 'model_b',
-            'Model C': 'model_c'   # Added Model C
-        }
-        model_id = model_mapping[selected_model]
-        API_URL = "https://1e53-186-154-39-104.ngrok-free.app/sentiment/image/"
-
         if st.button(texts['analyze_button']):
             with st.spinner('Analizando la imagen...' if selected_language == 'Español' else 'Analyzing image...'):
-                # Prepare data for API
-                buf = io.BytesIO()
-                if image.mode == 'RGBA':
-                    image = image.convert('RGB')
-                image.save(buf, format='JPEG')
-                byte_image = buf.getvalue()
-                files = {'file': ('image.jpg', byte_image, 'image/jpeg')}
-                data = {'model': model_id}
+                # Prepare data for API: no larger than the biggest model input
+                byte_image = encode_for_upload(image)
 
                 # Send POST request to API
                 try:
-                    response = requests.post(API_URL, files=files, data=data)
-                    response.raise_for_status()
+                    start = time.perf_counter()
+                    results = api.predict(byte_image, model_id)
                 except requests.exceptions.RequestException as e:
                     st.error(f"Error: {e}")
                 else:
-                    results = response.json()
                     expression_index = int(results.get('expresion', -1))
-                    expresion = class_to_idx.get(expression_index, 'Desconocida' if selected_language == 'Español' else 'Unknown')
-
-                    # Display Detected Expression
-                    st.markdown(f"### **{texts['feedback_title']}:** {expresion}")
-
-                    # Feedback Mechanism
-                    with st.expander("Proporcionar retroalimentación" if selected_language == 'Español' else "Provide Feedback"):
-                        feedback_options = ('Sí', 'No') if selected_language == 'Español' else ('Yes', 'No')
-                        feedback = st.radio("¿La expresión detectada es correcta?" if selected_language == 'Español' else "Is the detected expression correct?", feedback_options)
-                        if feedback == ('No' if selected_language == 'Español' else 'No'):
-                            correct_expression = st.selectbox('Seleccione la expresión correcta:' if selected_language == 'Español' else 'Select the correct expression:', list(sample_images.keys()))
-                            comments = st.text_area("Comentarios adicionales:" if selected_language == 'Español' else "Additional comments:")
-                            if st.button(texts['submit_feedback']):
-                                st.success("Gracias por tu retroalimentación." if selected_language == 'Español' else "Thank you for your feedback.")
-                        elif feedback == ('Sí' if selected_language == 'Español' else 'Yes'):
-                            st.success("¡Gracias por confirmar la predicción!" if selected_language == 'Español' else "Thank you for confirming the prediction!")
-
-                    # Option to Download Annotated Image
-                    st.download_button(
-                        label="Descargar imagen" if selected_language == 'Español' else "Download Image",
-                        data=byte_image,
-                        file_name='imagen_analizada.jpg' if selected_language == 'Español' else 'analyzed_image.jpg',
-                        mime='image/jpeg'
-                    )
 
-                    # Add to Session History
+                    # Kept across reruns, so the feedback form below can send it
+                    st.session_state['last_result'] = {
+                        'image': byte_image,
+                        'model': model_id,
+                        'predicted': expression_index,
+                        'latency_ms': (time.perf_counter() - start) * 1000.0,
+                        'feedback_sent': False,
+                    }
+
+                    # Add to Session History: thumbnails of the last HISTORY_SIZE analyses
                     if 'history' not in st.session_state:
-                        st.session_state['history'] = []
-                    st.session_state['history'].append({'image': image, 'expresion': expresion})
-
-                    # Display Session History
-                    if st.session_state['history']:
-                        with st.expander("Historial de análisis" if selected_language == 'Español' else "Analysis History"):
-                            for idx, entry in enumerate(st.session_state['history']):
-                                st.image(entry['image'], caption=f"Análisis {idx+1}: {entry['expresion']}" if selected_language == 'Español' else f"Analysis {idx+1}: {entry['expresion']}", use_column_width=True)
+                        st.session_state['history'] = deque(maxlen=HISTORY_SIZE)
+                        st.session_state['analyses'] = 0
+                    st.session_state['analyses'] += 1
+                    st.session_state['history'].append({
+                        'number': st.session_state['analyses'],
+                        'thumbnail': make_thumbnail(image),
+                        'predicted': expression_index,
+                    })
+
+        last_result = st.session_state.get('last_result')
+        if last_result is not None:
+            expresion = class_to_idx.get(last_result['predicted'], 'Desconocida' if selected_language == 'Español' else 'Unknown')
+
+            # Display Detected Expression
+            st.markdown(f"### **{texts['feedback_title']}:** {expresion}")
+
+            # Feedback Mechanism: sent to the API, which keeps it for retraining
+            with st.expander("Proporcionar retroalimentación" if selected_language == 'Español' else "Provide Feedback"):
+                if last_result['feedback_sent']:
+                    st.success("Gracias por tu retroalimentación." if selected_language == 'Español' else "Thank you for your feedback.")
+                else:
+                    feedback_options = ('Sí', 'No') if selected_language == 'Español' else ('Yes', 'No')
+                    feedback = st.radio("¿La expresión detectada es correcta?" if selected_language == 'Español' else "Is the detected expression correct?", feedback_options)
+                    correct = feedback != 'No'
+                    correct_expression = None
+                    comments = ''
+                    if not correct:
+                        correct_expression = st.selectbox('Seleccione la expresión correcta:' if selected_language == 'Español' else 'Select the correct expression:', list(class_to_idx), format_func=class_to_idx.get)
+                        comments = st.text_area("Comentarios adicionales:" if selected_language == 'Español' else "Additional comments:")
+                    if st.button(texts['submit_feedback']):
+                        try:
+                            api.send_feedback(last_result['image'], last_result['model'], last_result['predicted'],
+                                              correct, correct_expression, comments, last_result['latency_ms'])
+                        except requests.exceptions.RequestException as e:
+                            st.error(f"Error: {e}")
+                        else:
+                            last_result['feedback_sent'] = True
+                            if correct:
+                                st.success("¡Gracias por confirmar la predicción!" if selected_language == 'Español' else "Thank you for confirming the prediction!")
+                            else:
+                                st.success("Gracias por tu retroalimentación." if selected_language == 'Español' else "Thank you for your feedback.")
+
+            # Option to Download Annotated Image
+            st.download_button(
+                label="Descargar imagen" if selected_language == 'Español' else "Download Image",
+                data=last_result['image'],
+                file_name='imagen_analizada.jpg' if selected_language == 'Español' else 'analyzed_image.jpg',
+                mime='image/jpeg'
+            )
+
+            # Display Session History
+            if st.session_state.get('history'):
+                with st.expander("Historial de análisis" if selected_language == 'Español' else "Analysis History"):
+                    history = st.session_state['history']
+                    st.image(
+                        [entry['thumbnail'] for entry in history],
+                        caption=[f"Análisis {entry['number']}: {class_to_idx.get(entry['predicted'], '?')}" if selected_language == 'Español' else f"Analysis {entry['number']}: {class_to_idx.get(entry['predicted'], '?')}" for entry in history],
+                        width=THUMBNAIL_SIDE,
+                    )
     else:
         st.warning("Por favor, proporciona una imagen para analizar." if selected_language == 'Español' else "Please provide an image to analyze.")
 
@@ -0,0 +1,120 @@
+"""Production launch: several uvicorn workers under gunicorn, pinned to cores.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+run_api.sh (a single uvicorn process) stays the development setup. Here the
+app is imported once in the master (preload_app) and the workers are forked
+from it. Settings, as environment variables:
+
+- API_WORKERS: number of workers (default: one per core available to the
+  process).
+- API_BIND: address to listen on (default 0.0.0.0:8000).
+- PIN_WORKERS: 1 (default) pins every worker to its own share of the cores
+  with sched_setaffinity, so workers do not migrate and evict each other's
+  caches.
+- SHARED_MODELS: comma separated models loaded in the master before the
+  fork, whose weights the workers then share copy-on-write instead of each
+  holding a copy. Defaults to every model whose framework survives a fork,
+  which means the PyTorch ViT. TensorFlow and ONNX Runtime start thread
+  pools that a forked child cannot use, so the Keras models and ONNX
+  sessions are loaded by each worker (at startup if listed in WARMUP_MODELS).
+
+Each worker has C = cores / workers cores. Forward passes run one at a
+time (INFERENCE_WORKERS=1) on C threads (INFERENCE_THREADS, OMP_NUM_THREADS,
+MKL_NUM_THREADS; with more INFERENCE_WORKERS the C threads are split among
+them), so inference alone never needs more than the worker's cores.
+Decoding runs on another C threads (WORKER_POOL_SIZE), so a fully busy
+worker has up to 2 * C CPU-bound threads on its C cores, decoding and
+inference overlapping. Values set explicitly in the environment are kept.
+
+Prometheus metrics are written to PROMETHEUS_MULTIPROC_DIR (a fresh
+temporary directory unless set) and added up over the workers on /metrics.
+Metric files left there by an earlier run (*.db) are removed at startup;
+nothing else in the directory is touched.
+
+benchmarks/bench_workers.py measures throughput and memory for 1..N workers.
+"""
+import gc
+import glob
+import os
+import sys
+import tempfile
+
+CORES = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') \
+    else list(range(os.cpu_count() or 1))
+
+workers = int(os.getenv('API_WORKERS', str(len(CORES))))
+bind = os.getenv('API_BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+# Model loading can take a while on the first request to a worker
+timeout = 120
+graceful_timeout = 30
+
+PIN_WORKERS = os.getenv('PIN_WORKERS', '1') == '1'
+CORES_PER_WORKER = max(1, len(CORES) // workers)
+
+# Read by config.py, the frameworks and OpenMP when the app is preloaded
+os.environ.setdefault('INFERENCE_WORKERS', '1')
+INFERENCE_THREADS = str(max(1, CORES_PER_WORKER // max(1, int(os.environ['INFERENCE_WORKERS']))))
+for name in ('INFERENCE_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(name, INFERENCE_THREADS)
+os.environ.setdefault('WORKER_POOL_SIZE', str(CORES_PER_WORKER))
+
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Frameworks whose loaded models must not cross a fork
+NOT_FORK_SAFE = ('keras', 'onnx')
+
+
+def shared_models(registry):
+    names = os.getenv('SHARED_MODELS')
+    if names is not None:
+        return [m.strip() for m in names.split(',') if m.strip()]
+    return [m for m in registry.ids() if registry.framework(m) not in NOT_FORK_SAFE]
+
+
+def on_starting(server):
+    # Metric files of an earlier run would be added to this one's. Those the
+    # master wrote while preloading the app (named after its pid) are kept
+    own = f'_{os.getpid()}.db'
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        if not path.endswith(own):
+            os.remove(path)
+
+
+def when_ready(server):
+    # The app is already imported (preload_app); load the shared weights once
+    registry = sys.modules['app'].registry
+    models = shared_models(registry)
+    registry.warmup(models)
+    server.log.info("Loaded in the master, shared by the workers: %s", ", ".join(models) or "none")
+    # Objects that exist now are left out of garbage collection, so the
+    # collector does not write to (and copy) the workers' shared pages
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Lowest slot no live worker holds; a respawned worker takes over its cores
+    taken = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(workers + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    if PIN_WORKERS and hasattr(os, 'sched_setaffinity'):
+        first = worker.cpu_slot * CORES_PER_WORKER
+        cores = [CORES[(first + i) % len(CORES)] for i in range(CORES_PER_WORKER)]
+        os.sched_setaffinity(0, cores)
+        server.log.info("Worker %s pinned to cores %s", worker.pid, cores)
+    threads = int(os.environ['INFERENCE_THREADS'])
+    if threads and 'torch' in sys.modules:
+        # Resizes the intra-op pool of a model loaded in the master
+        sys.modules['torch'].set_num_threads(threads)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
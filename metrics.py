@@ -0,0 +1,192 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Under gunicorn (gunicorn.conf.py) every worker writes its samples to files
+# in PROMETHEUS_MULTIPROC_DIR and a scrape adds them up over the workers.
+# Values computed at scrape time (queue depths, cache counters) cannot be
+# shared that way: they come from the worker answering the scrape
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+_SCRAPE_TIME = CollectorRegistry() if MULTIPROCESS else REGISTRY
+
+# Stages of a request: read (upload body), decode, preprocess (resize),
+# batching (queued until the model answers), inference (one batched forward
+# pass) and serialize (building the response)
+STAGE_SECONDS = Histogram(
+    'sentiment_stage_seconds', 'Time spent in each stage of a request',
+    ['stage', 'model'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+BATCH_SIZE = Histogram(
+    'sentiment_batch_size', 'Images per forward pass', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+PREDICTIONS = Counter(
+    'sentiment_predictions', 'Predicted class per model', ['model', 'expresion'])
+FACES_PER_IMAGE = Histogram(
+    'sentiment_faces_per_image', 'Faces found per image by the face detector',
+    buckets=(0, 1, 2, 4, 8, 16, 32))
+STREAM_FRAMES = Counter(
+    'sentiment_stream_frames', 'Streamed frames by outcome (processed, dropped, failed)',
+    ['model', 'outcome'])
+IN_FLIGHT = Gauge('sentiment_requests_in_flight', 'HTTP requests being served',
+                  multiprocess_mode='livesum')
+REQUEST_SECONDS = Histogram(
+    'sentiment_request_seconds', 'End-to-end HTTP request time', ['path', 'status'])
+# Requests with a deadline by the model asked for and what the scheduler did:
+# requested (answered by it in time), fallback (by a cheaper model in time),
+# late (high priority, answered past the deadline), shed (refused up front)
+# or expired (deadline passed in the queue)
+SCHEDULED = Counter(
+    'sentiment_scheduled', 'Requests with a deadline by scheduling outcome', ['model', 'outcome'])
+
+# Label lookups take a lock, so the children are resolved once and reused
+_stage_children = {}
+
+# Set while a process pool worker runs a call (collect_observations): its
+# timings go back to the parent with the result, since the worker's own
+# registry is never scraped
+_collected = None
+
+
+def observe(stage, model, seconds):
+    if _collected is not None:
+        _collected.append((stage, model, seconds))
+        return
+    child = _stage_children.get((stage, model))
+    if child is None:
+        child = _stage_children[(stage, model)] = STAGE_SECONDS.labels(stage, model)
+    child.observe(seconds)
+
+
+def collect_observations(fn, *args):
+    """Runs ``fn`` in a pool process; returns its result and the observations it made."""
+    global _collected
+    _collected = []
+    try:
+        return fn(*args), _collected
+    finally:
+        _collected = None
+
+
+def replay_observations(observations):
+    for stage, model, seconds in observations:
+        observe(stage, model, seconds)
+
+
+@contextmanager
+def timed(stage, model):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, model, time.perf_counter() - start)
+
+
+def record_batch(model, size, seconds):
+    BATCH_SIZE.labels(model).observe(size)
+    observe('inference', model, seconds)
+
+
+def record_prediction(model, expresion):
+    PREDICTIONS.labels(model, str(expresion)).inc()
+
+
+def record_schedule(model, outcome):
+    SCHEDULED.labels(model, outcome).inc()
+
+
+def record_faces(count):
+    FACES_PER_IMAGE.observe(count)
+
+
+def record_stream_frames(model, outcome, count=1):
+    if count:
+        STREAM_FRAMES.labels(model, outcome).inc(count)
+
+
+class QueueCollector:
+    """Exposes the depth of the tracked queues at scrape time."""
+
+    def __init__(self):
+        self.queues = {}
+
+    def collect(self):
+        depth = GaugeMetricFamily('sentiment_queue_depth', 'Work items waiting in each queue',
+                                  labels=['queue'])
+        for name, depth_fn in self.queues.items():
+            depth.add_metric([name], depth_fn())
+        yield depth
+
+
+_queues = QueueCollector()
+_SCRAPE_TIME.register(_queues)
+
+
+def track_queue(name, depth_fn):
+    """Reports ``depth_fn()`` as the depth of a queue at scrape time."""
+    _queues.queues[name] = depth_fn
+
+
+class CacheCollector:
+    """Exposes the result cache counters at scrape time."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        yield CounterMetricFamily('sentiment_cache_hits', 'Result cache hits', value=stats['hits'])
+        yield CounterMetricFamily('sentiment_cache_misses', 'Result cache misses', value=stats['misses'])
+        yield GaugeMetricFamily('sentiment_cache_hit_ratio', 'Result cache hit rate', value=stats['hit_rate'])
+        yield GaugeMetricFamily('sentiment_cache_entries', 'Entries in the result cache', value=stats['entries'])
+
+
+def track_cache(cache):
+    _SCRAPE_TIME.register(CacheCollector(cache))
+
+
+def latest():
+    """The current metrics in the Prometheus text format."""
+    if not MULTIPROCESS:
+        return generate_latest()
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return generate_latest(registry) + generate_latest(_SCRAPE_TIME)
+
+
+class MetricsMiddleware:
+    """Counts in-flight requests and times them, as a plain ASGI middleware.
+
+    Only the listed paths get their own label; anything else is 'other', so
+    unknown URLs cannot blow up the number of time series.
+    """
+
+    def __init__(self, app, paths=()):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        path = scope['path'] if scope['path'] in self.paths else 'other'
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.labels(path, str(status)).observe(time.perf_counter() - start)
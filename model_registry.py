@@ -0,0 +1,96 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ModelRegistry:
+    """Loads models on first use and keeps at most ``max_resident`` in memory.
+
+    Each model is registered with a loader returning its batch predict
+    function (array of shape (N, ...) in, class probabilities out). Loaders
+    import their framework themselves, so TensorFlow or PyTorch are only
+    imported once a model that needs them is used. A model's ``version``
+    names its framework and weight file (with the file's size and mtime), so
+    results stored under it are not reused once either changes.
+    """
+
+    def __init__(self, max_resident=3):
+        self.max_resident = max(1, int(max_resident))
+        self._loaders = {}
+        self._frameworks = {}
+        self._versions = {}
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.load_seconds = {}
+
+    def register(self, model_id, framework, loader, weights=None):
+        self._loaders[model_id] = loader
+        self._frameworks[model_id] = framework
+        self._versions[model_id] = weights_version(framework, weights)
+        self._load_locks[model_id] = threading.Lock()
+
+    def __contains__(self, model_id):
+        return model_id in self._loaders
+
+    def ids(self):
+        return list(self._loaders)
+
+    def framework(self, model_id):
+        return self._frameworks[model_id]
+
+    def version(self, model_id):
+        return self._versions[model_id]
+
+    def resident(self):
+        with self._lock:
+            return list(self._models)
+
+    def get(self, model_id):
+        """Returns the predict function of a model, loading it if needed."""
+        if model_id not in self._loaders:
+            raise KeyError(f"Unknown model: {model_id}")
+        with self._lock:
+            if model_id in self._models:
+                self._models.move_to_end(model_id)
+                return self._models[model_id]
+
+        # Loading can take seconds, so only requests for this model wait on it
+        with self._load_locks[model_id]:
+            with self._lock:
+                if model_id in self._models:
+                    self._models.move_to_end(model_id)
+                    return self._models[model_id]
+            start = time.perf_counter()
+            predict = self._loaders[model_id]()
+            self.load_seconds[model_id] = time.perf_counter() - start
+
+        with self._lock:
+            self._models[model_id] = predict
+            evicted = []
+            while len(self._models) > self.max_resident:
+                evicted.append(self._models.popitem(last=False))
+        if evicted:
+            # Batches already running keep their own reference until they finish
+            del evicted
+            gc.collect()
+        return predict
+
+    def predict(self, model_id, batch):
+        return self.get(model_id)(batch)
+
+    def warmup(self, model_ids):
+        for model_id in model_ids:
+            self.get(model_id)
+
+
+def weights_version(framework, weights=None):
+    if weights is None:
+        return framework
+    try:
+        stat = os.stat(weights)
+    except OSError:
+        return f"{framework}:{weights}"
+    return f"{framework}:{weights}:{stat.st_size}:{stat.st_mtime_ns}"
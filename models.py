@@ -0,0 +1,105 @@
+import os
+from functools import partial
+
+import numpy as np
+
+from config import (
+    INFERENCE_BACKEND, INFERENCE_THREADS, MODEL_PATHS, ONNX_DIR, ONNX_USE_INT8,
+    ORT_INTER_OP_THREADS, ORT_INTRA_OP_THREADS,
+)
+from model_registry import ModelRegistry
+
+# Backbone of each served model; the Keras CNNs end in a softmax, the ViT
+# returns logits
+MODEL_FRAMEWORKS = {
+    'model_a': 'keras',
+    'model_b': 'keras',
+    'model_c': 'torch',
+}
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# Loaders for the served models. Framework imports stay inside each loader
+# so a worker only pays for TensorFlow or PyTorch when it needs them.
+
+def load_keras_model(path):
+    from keras.models import load_model
+
+    if INFERENCE_THREADS:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(INFERENCE_THREADS)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            pass  # Already fixed by an earlier model: the TF runtime is initialised
+    model = load_model(path)
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        return model.predict_on_batch(batch)
+    return predict
+
+
+def load_vit_model(path):
+    import torch
+
+    if INFERENCE_THREADS:
+        torch.set_num_threads(INFERENCE_THREADS)
+    # VIT-modelo.pth holds the whole pickled module, not just a state dict
+    model = torch.load(path, map_location=torch.device('cpu'), weights_only=False)
+    model.eval()  # Set the model to evaluation mode
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            outputs = model(torch.from_numpy(batch))
+            return torch.softmax(outputs, dim=1).numpy()
+    return predict
+
+
+def load_onnx_model(path, apply_softmax=False):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = ORT_INTRA_OP_THREADS or INFERENCE_THREADS
+    options.inter_op_num_threads = ORT_INTER_OP_THREADS
+    session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        outputs = session.run(None, {input_name: batch})[0]
+        return softmax(outputs) if apply_softmax else outputs
+    return predict
+
+
+def onnx_path(model_id, int8=ONNX_USE_INT8, onnx_dir=ONNX_DIR):
+    """File written by export_onnx.py for a model, preferring the INT8 one."""
+    quantized = os.path.join(onnx_dir, f'{model_id}.int8.onnx')
+    if int8 and os.path.exists(quantized):
+        return quantized
+    return os.path.join(onnx_dir, f'{model_id}.onnx')
+
+
+def register_models(registry, backend=INFERENCE_BACKEND, **onnx_options):
+    """Registers model_a, model_b and model_c with the loaders of a backend."""
+    if backend not in ('native', 'onnx'):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    for model_id, framework in MODEL_FRAMEWORKS.items():
+        if backend == 'onnx':
+            path = onnx_path(model_id, **onnx_options)
+            loader = partial(load_onnx_model, path, apply_softmax=framework == 'torch')
+            registry.register(model_id, 'onnx', loader, weights=path)
+        elif framework == 'keras':
+            registry.register(model_id, 'keras', partial(load_keras_model, MODEL_PATHS[model_id]),
+                              weights=MODEL_PATHS[model_id])
+        else:
+            registry.register(model_id, 'torch', partial(load_vit_model, MODEL_PATHS[model_id]),
+                              weights=MODEL_PATHS[model_id])
+    return registry
+
+
+def build_registry(max_resident, backend=INFERENCE_BACKEND, **onnx_options):
+    return register_models(ModelRegistry(max_resident), backend, **onnx_options)
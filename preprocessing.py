@@ -0,0 +1,134 @@
+import io
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import MAX_IMAGE_PIXELS, REDUCED_DECODE
+from metrics import observe
+
+# Input layout of each model: the Keras CNNs take 96x96 HWC images in [0, 1],
+# the ViT takes 224x224 CHW images normalised with the ImageNet statistics
+KERAS_SIZE = 96
+VIT_SIZE = 224
+MODEL_INPUTS = {
+    'model_a': 'keras',
+    'model_b': 'keras',
+    'model_c': 'vit',
+}
+INPUT_SIZES = {'keras': KERAS_SIZE, 'vit': VIT_SIZE}
+
+# Normalisation folded into one multiply-add per pixel: (x / 255 - mean) / std
+_KERAS_SCALE = np.float32(1.0 / 255.0)
+_VIT_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)  # Mean and std for ImageNet
+_VIT_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+_VIT_SCALE = (1.0 / (255.0 * _VIT_STD)).astype(np.float32)[:, None, None]
+_VIT_OFFSET = (-_VIT_MEAN / _VIT_STD).astype(np.float32)[:, None, None]
+
+
+def input_kind(model):
+    return MODEL_INPUTS[model]
+
+
+class ImageTooLargeError(ValueError):
+    """The image header declares more than MAX_IMAGE_PIXELS pixels."""
+
+
+def open_image(source) -> Image.Image:
+    """Opens an upload given as bytes or a binary file, reading only its header.
+
+    Files are read in place (e.g. a spooled upload), without copying them to
+    memory first. Images above MAX_IMAGE_PIXELS are refused here, before any
+    pixel data is decoded.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    else:
+        source.seek(0)
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height}, more than {MAX_IMAGE_PIXELS} pixels")
+    return image
+
+
+def decode_image(source, min_size=None) -> Image.Image:
+    """Decodes an upload to RGB, at reduced resolution when ``min_size`` allows.
+
+    For JPEGs the decoder can scale by 1/2, 1/4 or 1/8 while decoding; PIL
+    picks the smallest scale that keeps both sides at least ``min_size``.
+    Other formats are decoded fully and then box-reduced by an integer factor.
+    """
+    image = open_image(source)
+    if not (min_size and REDUCED_DECODE):
+        return image.convert('RGB')
+    image.draft('RGB', (min_size, min_size))
+    image = image.convert('RGB')
+    factor = min(image.size) // min_size
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image
+
+
+def resize_for(image: Image.Image, kind: str) -> np.ndarray:
+    """Resizes to the model input size, still as uint8 HWC."""
+    if kind == 'vit':
+        # Same filter as torchvision's Resize on PIL images
+        return np.asarray(image.resize((VIT_SIZE, VIT_SIZE), Image.BILINEAR))
+    return cv2.resize(np.asarray(image), (KERAS_SIZE, KERAS_SIZE))
+
+
+def normalize_batch(batch: np.ndarray, kind: str) -> np.ndarray:
+    """Turns a stacked uint8 (N, H, W, 3) batch into float32 model input."""
+    if kind == 'vit':
+        # Written straight into a contiguous NCHW buffer, no float64 or extra copies
+        n, h, w, c = batch.shape
+        out = np.empty((n, c, h, w), dtype=np.float32)
+        np.multiply(batch.transpose(0, 3, 1, 2), _VIT_SCALE, out=out)
+        out += _VIT_OFFSET
+        return out
+    return np.multiply(batch, _KERAS_SCALE, dtype=np.float32)
+
+
+def decode_and_preprocess(source, model: str) -> np.ndarray:
+    # Runs on the worker pool: decode the upload and resize it for the model.
+    # Normalisation is left to normalize_batch, once per batch
+    kind = input_kind(model)
+    start = time.perf_counter()
+    image = decode_image(source, INPUT_SIZES[kind])
+    decoded = time.perf_counter()
+    resized = resize_for(image, kind)
+    observe('decode', model, decoded - start)
+    observe('preprocess', model, time.perf_counter() - decoded)
+    return resized
+
+
+def decode_many(sources, model: str) -> list:
+    """decode_and_preprocess for several uploads in one worker pool job.
+
+    A failure stays with its image: it is returned in place of the array.
+    """
+    decoded = []
+    for source in sources:
+        try:
+            decoded.append(decode_and_preprocess(source, model))
+        except Exception as e:
+            decoded.append(e)
+    return decoded
+
+
+def decode_for_models(source, kinds) -> dict:
+    # Decode once at the largest input size needed, then resize per input kind
+    kinds = set(kinds)
+    start = time.perf_counter()
+    image = decode_image(source, max(INPUT_SIZES[kind] for kind in kinds))
+    decoded = time.perf_counter()
+    resized = {kind: resize_for(image, kind) for kind in kinds}
+    observe('decode', 'ensemble', decoded - start)
+    observe('preprocess', 'ensemble', time.perf_counter() - decoded)
+    return resized
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+_HASH_CHUNK = 1 << 16
+
+
+def content_digest(source) -> str:
+    """BLAKE2 digest of an upload, given as bytes or as a binary file read in chunks."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.blake2b(source, digest_size=16).hexdigest()
+    digest = hashlib.blake2b(digest_size=16)
+    source.seek(0)
+    for chunk in iter(lambda: source.read(_HASH_CHUNK), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(source, model_id: str, digest=None, version='') -> str:
+    """Key of an upload for a given model: a BLAKE2 digest of the raw bytes.
+
+    ``version`` (ModelRegistry.version) identifies the backend and weights,
+    so a persistent cache never answers with results of older ones.
+    """
+    return f"{model_id}:{version}:{digest or content_digest(source)}"
+
+
+def cache_keys(items, model_id, version=''):
+    return [cache_key(source, model_id, version=version) for source in items]
+
+
+class ResultCache:
+    """In-memory LRU cache of class probabilities with optional TTL."""
+
+    # Whether get/put may wait on I/O and so must stay off the event loop
+    blocking = False
+
+    def __init__(self, max_entries=1024, ttl=0):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def put(self, key, probs):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (np.asarray(probs, dtype=np.float32), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SqliteResultCache(ResultCache):
+    """Same cache kept in a sqlite file, shared by processes on the host.
+
+    The database runs in WAL mode so workers read while another writes.
+    Hits only read: their access times are kept in memory and written with
+    the next put, or every TOUCH_BATCH hits, so the LRU order lags a little
+    behind. A sqlite error (e.g. the database is locked by another worker)
+    counts as a miss or a skipped put, never as a failed request. Hit/miss
+    counters are per process.
+    """
+
+    blocking = True
+    TOUCH_BATCH = 256
+
+    def __init__(self, path, max_entries=1024, ttl=0):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self.errors = 0
+        self._touched = {}
+        self._connect()
+        # A connection must not cross a fork (gunicorn's preload_app): each
+        # worker opens its own
+        os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, probs BLOB NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT probs, created FROM results WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                row = None
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                # Expired rows are left for the next put's eviction to delete
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._write_touched()
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _write_touched(self):
+        # Called with the lock held; a failed write only loses LRU precision
+        touched, self._touched = self._touched, {}
+        try:
+            self._db.executemany("UPDATE results SET accessed = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in touched.items()])
+        except sqlite3.Error:
+            self.errors += 1
+
+    def put(self, key, probs):
+        if not self.max_entries:
+            return
+        now = time.time()
+        blob = np.asarray(probs, dtype=np.float32).tobytes()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, probs, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, blob, now, now))
+                self._write_touched()
+                if self.ttl:
+                    self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                # Evict the least recently used rows beyond the size limit
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results "
+                    "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self.errors += 1
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+
+    def __len__(self):
+        with self._lock:
+            try:
+                return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except sqlite3.Error:
+                self.errors += 1
+                return 0
+
+    def stats(self):
+        return dict(super().stats(), backend="sqlite", path=self.path, errors=self.errors)
+
+
+def build_result_cache(max_entries, ttl, path=''):
+    if path:
+        return SqliteResultCache(path, max_entries, ttl)
+    return ResultCache(max_entries, ttl)
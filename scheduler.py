@@ -0,0 +1,96 @@
+import math
+
+# Priority of a request (form field ``priority``), as the batching queues
+# order it: lower numbers are batched first
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+HIGH = PRIORITIES['high']
+
+
+class DeadlineError(Exception):
+    """No model is expected to answer a request within its deadline."""
+
+
+class MovingAverage:
+    """Exponentially weighted moving average of a duration, in seconds."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+
+    def observe(self, seconds):
+        # Written from the inference threads; a float assignment needs no lock
+        if self.value is None:
+            self.value = seconds
+        else:
+            self.value += self.alpha * (seconds - self.value)
+
+
+class Scheduler:
+    """Picks the model that answers a request with a deadline.
+
+    The wait of a new request on a model is estimated from live statistics:
+    the moving average of its preprocessing time, as measured inside the
+    worker and scaled by the worker pool backlog, plus the moving average
+    of one batched forward pass times the number of batches queued ahead of
+    the request at its priority, plus the part of the batch being computed. If the requested model cannot meet the deadline, its
+    ``fallbacks`` are tried in order. When none can, ``route`` raises
+    ``DeadlineError``, except for high priority requests, which are never
+    shed and go to the model expected to answer first.
+    """
+
+    def __init__(self, batchers, fallbacks=None, worker_pool=None, alpha=0.2):
+        self.batchers = batchers
+        self.fallbacks = {model: [m for m in models if m in batchers]
+                          for model, models in (fallbacks or {}).items()}
+        self.worker_pool = worker_pool
+        self.batch_seconds = {model: MovingAverage(alpha) for model in batchers}
+        self.preprocess_seconds = {model: MovingAverage(alpha) for model in batchers}
+
+    def observe_batch(self, model, seconds):
+        self.batch_seconds[model].observe(seconds)
+
+    def observe_preprocess(self, model, seconds):
+        self.preprocess_seconds[model].observe(seconds)
+
+    def estimate_ms(self, model, priority=PRIORITIES['normal']):
+        """Expected milliseconds until a request queued now on ``model`` is answered."""
+        batcher = self.batchers[model]
+        batch = self.batch_seconds[model].value or 0.0
+        preprocess = self.preprocess_seconds[model].value or 0.0
+        pool = self.worker_pool
+        if pool is not None:
+            preprocess *= 1 + pool.pending // pool.max_workers
+        batches = math.ceil((batcher.depth(priority) + 1) / batcher.max_batch_size)
+        # On average half of the batch being computed is still to go
+        running = batch / 2 if batcher.running else 0.0
+        return (preprocess + batcher.max_wait + running + batches * batch) * 1000.0
+
+    def route(self, model, deadline_ms=None, priority=PRIORITIES['normal']):
+        """Returns the model to run the request on, ``model`` itself if it can make it."""
+        if deadline_ms is None:
+            return model
+        candidates = [model] + [m for m in self.fallbacks.get(model, []) if m != model]
+        estimates = {}
+        for candidate in candidates:
+            estimates[candidate] = self.estimate_ms(candidate, priority)
+            if estimates[candidate] <= deadline_ms:
+                return candidate
+        if priority == HIGH:
+            return min(candidates, key=estimates.get)
+        raise DeadlineError(
+            f"Expected wait of {min(estimates.values()):.0f} ms exceeds the {deadline_ms:.0f} ms deadline")
+
+    def stats(self):
+        return {
+            model: {
+                "batch_ms": _ms(self.batch_seconds[model].value),
+                "preprocess_ms": _ms(self.preprocess_seconds[model].value),
+                "queued": self.batchers[model].depth(),
+                "estimate_ms": round(self.estimate_ms(model), 2),
+            }
+            for model in self.batchers
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2) if seconds is not None else None
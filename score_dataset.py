@@ -0,0 +1,184 @@
+"""Scores a folder or archive of images offline, without going through HTTP.
+
+    python score_dataset.py data/affectnet/val --model model_a --output val_scores.csv
+    python score_dataset.py shard.tar --model model_c --output scores.parquet --workers 8
+    python score_dataset.py data/val --model model_a --output val.csv --labels-from-dirs
+
+Uses the same model loading (models.py, INFERENCE_BACKEND included) and
+preprocessing as the API. Images are decoded by a pool of workers that run
+ahead of the model by --prefetch batches. Results are appended to the output
+after every batch (CSV) or every --flush-every batches (Parquet, one part file
+per flush), so an interrupted run picks up where it stopped when started
+again with the same output. With labels, a confusion matrix is printed at
+the end.
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from archives import is_image_name, iter_archive_images
+from models import build_registry
+from preprocessing import decode_and_preprocess, input_kind, normalize_batch
+from serialization import CLASS_NAMES, NUM_CLASSES
+from table_outputs import CsvOutput, ParquetOutput
+
+CLASS_ALIASES = {'happiness': 'happy', 'sadness': 'sad', 'angry': 'anger', 'disgusted': 'disgust'}
+
+PROB_COLUMNS = [f'prob_{i}' for i in range(NUM_CLASSES)]
+SCHEMA = ([('path', 'string'), ('expresion', 'int64'), ('label', 'int64')]
+          + [(name, 'float32') for name in PROB_COLUMNS] + [('error', 'string')])
+COLUMNS = [name for name, _ in SCHEMA]
+
+
+def parse_label(value):
+    value = str(value).strip().lower()
+    if value.isdigit():
+        # Indices outside the model's classes would only fail in the confusion matrix
+        return int(value) if int(value) < NUM_CLASSES else None
+    value = CLASS_ALIASES.get(value, value)
+    return CLASS_NAMES.index(value) if value in CLASS_NAMES else None
+
+
+def iter_sources(source):
+    """Yields (name, path or bytes) for every image of a directory or archive."""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '**', '*'), recursive=True)
+        for path in sorted(p for p in paths if os.path.isfile(p) and is_image_name(p)):
+            yield os.path.relpath(path, source), path
+    else:
+        with open(source, 'rb') as f:
+            yield from iter_archive_images(f)
+
+
+def load_and_preprocess(data, model):
+    # Runs on the decode workers; directory entries are read there too
+    if isinstance(data, str):
+        with open(data, 'rb') as f:
+            data = f.read()
+    return decode_and_preprocess(data, model)
+
+
+def prefetch(executor, items, model, depth):
+    """Submits decode jobs ahead of time, keeping at most ``depth`` in flight."""
+    pending = deque()
+    for name, data in items:
+        pending.append((name, executor.submit(load_and_preprocess, data, model)))
+        if len(pending) >= depth:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+
+def as_int(value):
+    return None if value in (None, '') else int(value)
+
+
+def confusion_matrix(pairs):
+    matrix = np.zeros((NUM_CLASSES, NUM_CLASSES), dtype=np.int64)
+    for predicted, label in pairs:
+        matrix[label, predicted] += 1
+    return matrix
+
+
+def print_confusion(matrix):
+    total = matrix.sum()
+    print(f"\naccuracy {np.trace(matrix) / total:.1%} on {total} labelled images")
+    print("rows: true class, columns: predicted class")
+    print(' ' * 10 + ''.join(f'{name[:8]:>9s}' for name in CLASS_NAMES))
+    for name, row in zip(CLASS_NAMES, matrix):
+        print(f'{name:10s}' + ''.join(f'{v:9d}' for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='Image directory, or a zip/tar archive')
+    parser.add_argument('--model', required=True, choices=['model_a', 'model_b', 'model_c'])
+    parser.add_argument('--output', required=True,
+                        help='Results file: .csv, or .parquet for a directory of Parquet parts')
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--processes', action='store_true',
+                        help='Decode in worker processes instead of threads')
+    parser.add_argument('--prefetch', type=int, default=4, help='Batches decoded ahead of the model')
+    parser.add_argument('--flush-every', type=int, default=20, help='Batches per Parquet part file')
+    parser.add_argument('--labels', help='CSV with path,label columns (class index or name)')
+    parser.add_argument('--labels-from-dirs', action='store_true',
+                        help='Use the name of the folder holding each image as its label')
+    args = parser.parse_args()
+
+    if args.output.endswith('.parquet'):
+        output = ParquetOutput(args.output, SCHEMA, args.flush_every)
+    else:
+        output = CsvOutput(args.output, SCHEMA)
+
+    labels = {}
+    if args.labels:
+        with open(args.labels, newline='') as f:
+            labels = {row['path']: parse_label(row['label']) for row in csv.DictReader(f)}
+
+    def label_of(name):
+        if args.labels_from_dirs:
+            return parse_label(os.path.basename(os.path.dirname(name)))
+        return labels.get(name)
+
+    done = {row['path']: (row['expresion'], row['label'])
+            for row in output.read(['path', 'expresion', 'label'])}
+    if done:
+        print(f"resuming: {len(done)} images already scored in {args.output}")
+    scored = [(as_int(e), as_int(l)) for e, l in done.values()]
+    todo = ((name, data) for name, data in iter_sources(args.source) if name not in done)
+
+    registry = build_registry(1)
+    predict = registry.get(args.model)
+    kind = input_kind(args.model)
+
+    executor_class = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    start = time.perf_counter()
+    count = 0
+    with executor_class(max_workers=args.workers) as executor:
+        jobs = prefetch(executor, todo, args.model, args.batch_size * args.prefetch)
+        try:
+            while True:
+                batch = [job for _, job in zip(range(args.batch_size), jobs)]
+                if not batch:
+                    break
+                rows, inputs = [], []
+                for name, future in batch:
+                    row = dict.fromkeys(COLUMNS, None)
+                    row.update(path=name, label=label_of(name))
+                    try:
+                        inputs.append((row, future.result()))
+                    except Exception as e:
+                        row['error'] = str(e)
+                    rows.append(row)
+                if inputs:
+                    probs = predict(normalize_batch(np.stack([x for _, x in inputs]), kind))
+                    for (row, _), p in zip(inputs, probs):
+                        row['expresion'] = int(np.argmax(p))
+                        row.update(zip(PROB_COLUMNS, (float(v) for v in p)))
+                        scored.append((row['expresion'], row['label']))
+                output.write(rows)
+
+                count += len(rows)
+                rate = count / (time.perf_counter() - start)
+                print(f"\r{count} images, {rate:.1f} img/s", end='', file=sys.stderr, flush=True)
+        finally:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nscored {count} images in {elapsed:.1f} s ({count / max(elapsed, 1e-9):.1f} img/s)")
+
+    pairs = [(e, l) for e, l in scored if e is not None and l is not None]
+    if pairs:
+        print_confusion(confusion_matrix(pairs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import base64
+import json
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # only needed for format=msgpack
+    msgpack = None
+
+NUM_CLASSES = 8
+# Class order of the models' outputs, with the folder/label names AffectNet uses
+CLASS_NAMES = ['anger', 'contempt', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+# format=... values accepted by the endpoints
+RESPONSE_FORMATS = ('json', 'msgpack', 'binary')
+# probs_encoding=... values: a JSON list of floats, or base64 of little-endian float32
+PROBS_ENCODINGS = ('list', 'base64')
+
+
+def check_options(response_format, probs_encoding, top_k):
+    """Returns an error message for unsupported options, or None."""
+    if response_format not in RESPONSE_FORMATS:
+        return f"format must be one of {', '.join(RESPONSE_FORMATS)}"
+    if response_format == 'msgpack' and msgpack is None:
+        return "format=msgpack needs the msgpack package on the server"
+    if probs_encoding not in PROBS_ENCODINGS:
+        return f"probs_encoding must be one of {', '.join(PROBS_ENCODINGS)}"
+    if not 0 <= top_k <= NUM_CLASSES:
+        return f"top_k must be between 0 and {NUM_CLASSES}"
+    return None
+
+
+def top_k_classes(probs, k):
+    """The k most likely classes, best first, as [{"expresion", "score"}]."""
+    probs = np.asarray(probs, dtype=np.float32)
+    best = np.argsort(-probs, kind='stable')[:k]
+    return [{"expresion": int(i), "score": float(probs[i])} for i in best]
+
+
+def encode_probs(probs, encoding='list', binary=False):
+    probs = np.asarray(probs, dtype='<f4')
+    if binary:
+        return probs.tobytes()
+    if encoding == 'base64':
+        return base64.b64encode(probs.tobytes()).decode('ascii')
+    # Six decimals is all float32 carries; keeps the JSON short
+    return np.round(probs.astype(np.float64), 6).tolist()
+
+
+def build_result(probs, top_k=0, return_probs=False, probs_encoding='list', binary=False):
+    """Result fields for one image from its probability vector.
+
+    Everything is derived from the cached/computed probabilities, so asking
+    for top-k classes or the full vector costs no extra inference.
+    """
+    result = {"expresion": int(np.argmax(probs))}
+    if top_k:
+        result["top_k"] = top_k_classes(probs, top_k)
+    if return_probs:
+        result["probabilities"] = encode_probs(probs, probs_encoding, binary)
+    return result
+
+
+def probability_matrix(rows):
+    """Stacks probability vectors into (N, 8) float32; None rows become NaN."""
+    matrix = np.full((len(rows), NUM_CLASSES), np.nan, dtype='<f4')
+    for i, probs in enumerate(rows):
+        if probs is not None:
+            matrix[i] = probs
+    return matrix
+
+
+def binary_response(rows, headers=None):
+    """Raw little-endian float32 (N, 8) probabilities for machine clients.
+
+    Read with np.frombuffer(body, '<f4').reshape(N, 8); images that failed
+    have a row of NaN.
+    """
+    matrix = probability_matrix(rows)
+    headers = dict(headers or {}, **{"X-Shape": f"{matrix.shape[0]},{matrix.shape[1]}"})
+    return Response(content=matrix.tobytes(), media_type="application/octet-stream",
+                    headers=headers)
+
+
+def render(payload, response_format='json'):
+    if response_format == 'msgpack':
+        return Response(content=msgpack.packb(payload, use_bin_type=True),
+                        media_type="application/msgpack")
+    return JSONResponse(payload)
+
+
+def ndjson_line(payload):
+    return json.dumps(payload, separators=(',', ':')) + "\n"
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameBuffer:
+    """Holds the newest frames of a stream, dropping the oldest when full.
+
+    A live stream only cares about the latest frames: when inference falls
+    behind, older ones are discarded instead of building up lag.
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max(1, int(max_pending))
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._frames = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, data):
+        self._frames.append((self.received, data, time.perf_counter()))
+        self.received += 1
+        while len(self._frames) > self.max_pending:
+            self._frames.popleft()
+            self.dropped += 1
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def take(self, limit):
+        """Waits for frames and returns up to ``limit`` of them, oldest first.
+
+        Returns an empty list once the stream is closed and drained.
+        """
+        while not self._frames and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        return [self._frames.popleft() for _ in range(min(limit, len(self._frames)))]
+
+
+class Smoother:
+    """Mean of the class probabilities over the last ``window`` frames."""
+
+    def __init__(self, window):
+        self._history = deque(maxlen=max(1, int(window)))
+
+    def update(self, probs):
+        self._history.append(np.asarray(probs, dtype=np.float32))
+        return np.mean(self._history, axis=0)
@@ -0,0 +1,88 @@
+"""Resumable row outputs of the offline scripts (score_dataset.py, export_feedback.py).
+
+Both take a schema, a list of (column, pyarrow type name) pairs such as
+('label', 'int64'), and append rows given as dicts keyed by column. pyarrow is
+only imported for Parquet output.
+"""
+import csv
+import glob
+import os
+
+
+class CsvOutput:
+    def __init__(self, path, schema):
+        self.path = path
+        self.columns = [name for name, _ in schema]
+
+    def read(self, columns):
+        """Yields the rows already written, as dicts of ``columns`` (strings, as read)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, newline='') as f:
+            for row in csv.DictReader(f):
+                yield {name: row[name] for name in columns}
+
+    def write(self, rows):
+        new = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            if new:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class ParquetOutput:
+    """A directory of Parquet part files, one per ``flush_every`` writes."""
+
+    def __init__(self, path, schema, flush_every=1):
+        import pyarrow  # noqa: F401  fail early if Parquet support is missing
+
+        self.path = path
+        self.schema = schema
+        self.flush_every = max(1, flush_every)
+        self._buffer = []
+        self._writes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def read(self, columns):
+        """Yields the rows already written, as dicts of ``columns``."""
+        import pyarrow.parquet as pq
+
+        for part in sorted(glob.glob(os.path.join(self.path, 'part-*.parquet'))):
+            table = pq.read_table(part, columns=list(columns)).to_pydict()
+            for values in zip(*(table[name] for name in columns)):
+                yield dict(zip(columns, values))
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        self._writes += 1
+        if self._writes >= self.flush_every:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._buffer:
+            return
+        # Explicit types, so parts whose optional columns are all empty still
+        # read back as one dataset
+        schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in self.schema])
+        columns = {name: [row[name] for row in self._buffer] for name in schema.names}
+        for name, type_name in self.schema:
+            if type_name == 'bool_':
+                # sqlite hands booleans over as 0/1
+                columns[name] = [None if v is None else bool(v) for v in columns[name]]
+        parts = len(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+        # Written under a temporary name so a crash never leaves half a part
+        target = os.path.join(self.path, f'part-{parts:05d}.parquet')
+        pq.write_table(pa.table(columns, schema=schema), target + '.tmp')
+        os.replace(target + '.tmp', target)
+        self._buffer = []
+        self._writes = 0
+
+    def close(self):
+        self._flush()
@@ -0,0 +1,61 @@
+"""Endpoint checks against app.py served with the numpy stand-in models.
+
+    python -m pytest tests
+"""
+import glob
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+os.environ.update(FEEDBACK_PATH='', RESULT_CACHE_SIZE='0', RESULT_CACHE_PATH='')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as api  # noqa: E402
+from standins import use_standins  # noqa: E402
+
+use_standins(api.registry, 'always')
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(api.app) as client:
+        yield client
+
+
+@pytest.fixture(scope='module')
+def image():
+    with open(sorted(glob.glob(os.path.join(ROOT, 'samples', '*.png')))[0], 'rb') as f:
+        return f.read()
+
+
+def post(client, path, image, **data):
+    return client.post(path, data=data, files={'file': ('face.png', image, 'image/png')})
+
+
+def test_image(client, image):
+    response = post(client, '/sentiment/image/', image, model='model_a')
+    assert response.status_code == 200
+    assert 0 <= response.json()['expresion'] < 8
+
+
+def test_image_all(client, image):
+    response = post(client, '/sentiment/image/all', image)
+    assert response.status_code == 200
+    assert set(response.json()['models']) == {'model_a', 'model_b', 'model_c'}
+
+
+def test_image_with_deadline(client, image):
+    response = post(client, '/sentiment/image/', image, model='model_c', deadline_ms='10000',
+                    priority='high')
+    assert response.status_code == 200
+    assert response.json()['model_used'] in ('model_a', 'model_b', 'model_c')
+
+
+def test_image_bad_priority(client, image):
+    response = post(client, '/sentiment/image/', image, model='model_a', priority='urgent')
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_expired_requests_leave_the_queue():
+    release = threading.Event()
+
+    def predict(batch):
+        release.wait(5)
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(predict, max_batch_size=1, max_wait_ms=0, max_queue=2)
+        first = asyncio.ensure_future(batcher.submit(np.zeros(1)))
+        await asyncio.sleep(0.05)  # Now running, the queue is empty
+        for _ in range(2):
+            try:
+                await asyncio.wait_for(batcher.submit(np.zeros(1)), 0.01)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(0)
+        depth = batcher.depth()
+        # Admission counts live requests only, so this one is queued
+        late = asyncio.ensure_future(batcher.submit(np.ones(1)))
+        await asyncio.sleep(0)
+        release.set()
+        await first
+        return depth, await late
+
+    depth, late = run(scenario())
+    assert depth == 0
+    assert late[0] == 1
+
+
+def test_priorities_age():
+    order = []
+    release = threading.Event()
+
+    def predict(batch):
+        release.wait(5)
+        order.extend(int(x[0]) for x in batch)
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(predict, max_batch_size=1, max_wait_ms=0, aging_ms=20)
+        blocker = asyncio.ensure_future(batcher.submit(np.array([-1])))
+        await asyncio.sleep(0.01)
+        low = asyncio.ensure_future(batcher.submit(np.array([2]), priority=2))
+        await asyncio.sleep(0.1)  # Longer than two levels of aging
+        high = asyncio.ensure_future(batcher.submit(np.array([0]), priority=0))
+        fresh_low = asyncio.ensure_future(batcher.submit(np.array([3]), priority=2))
+        await asyncio.sleep(0)
+        assert batcher.depth(0) == 2  # The aged low one is ahead of the new high one
+        release.set()
+        await asyncio.gather(blocker, low, high, fresh_low)
+
+    run(scenario())
+    assert order == [-1, 2, 0, 3]
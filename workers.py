@@ -0,0 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import collect_observations, replay_observations
+
+
+class QueueFullError(Exception):
+    """Raised when a pool or batching queue cannot take more work."""
+
+
+def _timed_call(fn, *args):
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+class WorkerPool:
+    """Runs blocking calls off the event loop on a bounded thread or process pool.
+
+    At most ``max_workers`` calls run at once and ``max_queue`` more may wait;
+    anything beyond that raises ``QueueFullError`` right away. Stage timings
+    a call records in a worker process are sent back and recorded here.
+    """
+
+    def __init__(self, max_workers, max_queue, kind='thread'):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers))
+        self.limit = self.max_workers + max(0, int(max_queue))
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Created on first use so importing the app does not start workers
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='worker')
+        return self._executor
+
+    async def run(self, fn, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= self.limit:
+            raise QueueFullError("Worker pool is full")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == 'thread':
+                return await loop.run_in_executor(self.executor, fn, *args)
+            result, observations = await loop.run_in_executor(
+                self.executor, collect_observations, fn, *args)
+            replay_observations(observations)
+            return result
+        finally:
+            self.pending -= 1
+
+    async def run_timed(self, fn, *args):
+        """Like run(), also returning the seconds ``fn`` itself took, queueing left out."""
+        return await self.run(_timed_call, fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None